@@ -1,17 +1,48 @@
 # app/main.py
 
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from app.routers import api
+from app.models.jobs import job_manager
+from app.utils.config import Config
 from app.utils.logger import get_logger
+from app.utils.metrics import MetricsMiddleware
+from app.utils.resources import resources
 
 logger = get_logger(__name__)
 
+
+async def _warm_up():
+    try:
+        await run_in_threadpool(resources.warm_up)
+    except Exception as e:
+        # Still serve requests; the model loads on first use instead
+        logger.error(f"Warm-up failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_up = None
+    if Config.WARM_UP_ON_STARTUP:
+        # Warm up in the background so /health answers as soon as we're up
+        warm_up = asyncio.create_task(_warm_up())
+    yield
+    if warm_up is not None:
+        warm_up.cancel()
+    job_manager.shutdown()
+    await resources.aclose()
+
+
 app = FastAPI(
     title="PDF Question Answering Agent",
     description="Upload a PDF and enter your questions to receive answers based on the document's content.",
     version="0.0.2",
+    lifespan=lifespan,
 )
 
+app.add_middleware(MetricsMiddleware)
 app.include_router(api.router)
 
 if __name__ == "__main__":
@@ -0,0 +1,91 @@
+"""Move chunks from per-PDF collections into the shared collection.
+
+    python -m app.migrate_layout [--batch-size 1000] [--keep-collections]
+
+Run with the service stopped (or still on VECTOR_LAYOUT=per_pdf), then
+start it with VECTOR_LAYOUT=shared. Stored embeddings are copied as they
+are, so nothing is re-embedded. Collections of PDFs that are not in the
+catalog (e.g. left over from benchmarks) are skipped. Each collection is
+deleted once it has been copied, unless --keep-collections is given; the
+copy is an upsert, so an interrupted migration can simply be run again.
+"""
+
+import argparse
+import json
+import time
+
+from app.models.catalog import catalog
+from app.utils.logger import get_logger
+from app.utils.resources import resources, CHUNK_COLLECTION, SUMMARY_COLLECTION
+
+logger = get_logger(__name__)
+
+
+def migrate_to_shared(registry=resources, batch_size=1000, keep_collections=False):
+    shared = registry.get_collection(CHUNK_COLLECTION)
+    names = [
+        name
+        for name in registry.list_collections()
+        if name not in (SUMMARY_COLLECTION, CHUNK_COLLECTION)
+    ]
+    stats = {"pdfs": 0, "chunks": 0, "skipped": 0}
+    for name in names:
+        if catalog.get(name) is None:
+            logger.warning(f"Skipping collection {name}: not in the PDF catalog")
+            stats["skipped"] += 1
+            continue
+        try:
+            collection = registry.get_collection(name)
+            count = collection.count()
+            for offset in range(0, count, batch_size):
+                batch = collection.get(
+                    limit=batch_size,
+                    offset=offset,
+                    include=["embeddings", "documents", "metadatas"],
+                )
+                shared.upsert(
+                    ids=[f"{name}:{chunk_id}" for chunk_id in batch["ids"]],
+                    embeddings=batch["embeddings"],
+                    documents=batch["documents"],
+                    metadatas=[
+                        {**(metadata or {}), "pdf_id": name}
+                        for metadata in batch["metadatas"]
+                    ],
+                )
+            page_index = (collection.metadata or {}).get("page_index")
+            if page_index:
+                catalog.set_page_index(name, json.loads(page_index))
+            if not keep_collections:
+                registry.delete_collection(name)
+        except Exception as e:
+            logger.error(f"Error migrating collection {name}: {e}")
+            raise e
+        stats["pdfs"] += 1
+        stats["chunks"] += count
+        logger.info(f"Migrated {name} ({count} chunks)")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument(
+        "--keep-collections",
+        action="store_true",
+        help="leave the per-PDF collections in place after copying them",
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = migrate_to_shared(
+        batch_size=args.batch_size, keep_collections=args.keep_collections
+    )
+    logger.info(
+        f"Moved {stats['chunks']} chunks of {stats['pdfs']} PDFs to "
+        f"{CHUNK_COLLECTION} in {time.perf_counter() - start:.1f}s "
+        f"({stats['skipped']} collections skipped)"
+    )
+
+
+if __name__ == "__main__":
+    main()
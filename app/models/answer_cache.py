@@ -0,0 +1,126 @@
+# app/models/answer_cache.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from app.utils.config import Config
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(question.casefold().split())
+
+
+class AnswerCache:
+    """Two-tier cache of LLM answers: an in-process LRU in front of SQLite.
+
+    Entries are keyed on the pdf_id, the normalized question, a hash of the
+    retrieved context and the answer model, so a changed context or model
+    never returns a stale answer. The SQLite file survives restarts and can
+    be shared by several worker processes.
+    """
+
+    def __init__(self, path, max_memory_entries):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(pdf_id, question, context, model) -> str:
+        context_hash = hashlib.sha256(context.encode("utf-8")).hexdigest()
+        raw = "\0".join([pdf_id, normalize_question(question), context_hash, model])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, pdf_id, question, context, model):
+        key = self.make_key(pdf_id, question, context, model)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[1]
+            row = (
+                self._connect()
+                .execute("SELECT answer FROM answers WHERE key = ?", (key,))
+                .fetchone()
+            )
+            if row is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, pdf_id, row[0])
+            return row[0]
+
+    def put(self, pdf_id, question, context, model, answer):
+        key = self.make_key(pdf_id, question, context, model)
+        with self._lock:
+            self._remember(key, pdf_id, answer)
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO answers (key, pdf_id, answer, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, pdf_id, answer, time.time()),
+            )
+            db.commit()
+
+    def invalidate(self, pdf_id):
+        with self._lock:
+            for key in [k for k, (p, _) in self._memory.items() if p == pdf_id]:
+                del self._memory[key]
+            db = self._connect()
+            deleted = db.execute("DELETE FROM answers WHERE pdf_id = ?", (pdf_id,)).rowcount
+            db.commit()
+        logger.info(f"Invalidated {deleted} cached answers for {pdf_id}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            disk_entries = (
+                self._connect().execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            )
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+            }
+
+    def _remember(self, key, pdf_id, answer):
+        self._memory[key] = (pdf_id, answer)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _connect(self):
+        # Opened on first use so importing this module touches no files
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, pdf_id TEXT NOT NULL, "
+                "answer TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS answers_pdf_id ON answers (pdf_id)")
+            db.commit()
+            self._db = db
+        return self._db
+
+
+answer_cache = AnswerCache(
+    path=Config.ANSWER_CACHE_PATH,
+    max_memory_entries=Config.ANSWER_CACHE_MEMORY_ENTRIES,
+)
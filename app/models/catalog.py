@@ -0,0 +1,252 @@
+# app/models/catalog.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from app.utils.config import Config
+from app.utils.logger import get_logger
+from app.utils.resources import resources, SUMMARY_COLLECTION
+
+logger = get_logger(__name__)
+
+FIELDS = (
+    "pdf_id",
+    "name",
+    "summary",
+    "content_hash",
+    "pages",
+    "chunks",
+    "size_bytes",
+    "created_at",
+)
+
+BACKFILL_BATCH_SIZE = 500
+
+
+class PDFCatalog:
+    """SQLite index of the ingested PDFs, one row per pdf_id.
+
+    Lookups by pdf_id or content hash and paging through the PDFs are
+    single indexed queries, however many PDFs (and Chroma collections)
+    there are. Rows are ordered by insertion; a page cursor is the position
+    of the last row returned.
+
+    On first use an empty catalog is filled from the ``pdf_summaries``
+    collection, so PDFs ingested before the catalog existed are listed too
+    (without their name, page count and size, which were never stored).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+
+    def add(
+        self,
+        pdf_id,
+        summary,
+        content_hash=None,
+        name=None,
+        pages=None,
+        chunks=None,
+        size_bytes=None,
+    ):
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO pdfs (pdf_id, name, summary, content_hash, "
+                "pages, chunks, size_bytes, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (pdf_id, name, summary, content_hash, pages, chunks, size_bytes, time.time()),
+            )
+            db.commit()
+
+    def update(self, pdf_id, **values):
+        # None values are left as they are
+        values = {key: value for key, value in values.items() if value is not None}
+        unknown = set(values) - set(FIELDS[1:-1])
+        if unknown:
+            raise ValueError(f"Unknown catalog fields: {sorted(unknown)}")
+        if not values:
+            return
+        assignments = ", ".join(f"{key} = ?" for key in values)
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                f"UPDATE pdfs SET {assignments} WHERE pdf_id = ?",
+                (*values.values(), pdf_id),
+            )
+            db.commit()
+
+    def get(self, pdf_id):
+        with self._lock:
+            return self._one("SELECT * FROM pdfs WHERE pdf_id = ?", (pdf_id,))
+
+    def find_by_hash(self, content_hash):
+        with self._lock:
+            return self._one(
+                "SELECT * FROM pdfs WHERE content_hash = ? LIMIT 1", (content_hash,)
+            )
+
+    def delete(self, pdf_id) -> bool:
+        with self._lock:
+            db = self._connect()
+            deleted = db.execute("DELETE FROM pdfs WHERE pdf_id = ?", (pdf_id,)).rowcount
+            db.execute("DELETE FROM page_indexes WHERE pdf_id = ?", (pdf_id,))
+            db.commit()
+        return deleted > 0
+
+    def summaries_version(self):
+        # Bumped whenever a summary is added, changed or deleted, so every
+        # process can tell when its in-memory routing matrix is stale
+        with self._lock:
+            row = (
+                self._connect()
+                .execute("SELECT value FROM catalog_meta WHERE key = 'summaries_version'")
+                .fetchone()
+            )
+        return int(row["value"]) if row else 0
+
+    def bump_summaries_version(self):
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                "INSERT INTO catalog_meta (key, value) VALUES ('summaries_version', '1') "
+                "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+            )
+            row = db.execute(
+                "SELECT value FROM catalog_meta WHERE key = 'summaries_version'"
+            ).fetchone()
+            db.commit()
+        return int(row["value"])
+
+    def get_page_index(self, pdf_id):
+        # Page hashes used by replace_pdf, for the shared chunk layout (the
+        # per-PDF layout keeps them in the collection metadata)
+        with self._lock:
+            row = (
+                self._connect()
+                .execute("SELECT page_index FROM page_indexes WHERE pdf_id = ?", (pdf_id,))
+                .fetchone()
+            )
+        return json.loads(row["page_index"]) if row else None
+
+    def set_page_index(self, pdf_id, page_index):
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO page_indexes (pdf_id, page_index) VALUES (?, ?)",
+                (pdf_id, json.dumps(page_index)),
+            )
+            db.commit()
+
+    def list(self, limit, cursor=None, fields=FIELDS):
+        """Return ``(rows, next_cursor)`` for one page of PDFs.
+
+        ``next_cursor`` is None on the last page. Raises ``ValueError`` for an
+        unknown field or a malformed cursor.
+        """
+        unknown = set(fields) - set(FIELDS)
+        if unknown:
+            raise ValueError(
+                f"Unknown fields {sorted(unknown)}, choose from: {', '.join(FIELDS)}"
+            )
+        try:
+            after = int(cursor) if cursor else 0
+        except ValueError:
+            raise ValueError(f"Invalid cursor: {cursor!r}")
+        columns = ", ".join(["seq", *dict.fromkeys(["pdf_id", *fields])])
+        with self._lock:
+            rows = (
+                self._connect()
+                .execute(
+                    f"SELECT {columns} FROM pdfs WHERE seq > ? ORDER BY seq LIMIT ?",
+                    (after, limit + 1),
+                )
+                .fetchall()
+            )
+        next_cursor = str(rows[limit - 1]["seq"]) if len(rows) > limit else None
+        return [
+            {key: row[key] for key in row.keys() if key != "seq"} for row in rows[:limit]
+        ], next_cursor
+
+    def _one(self, query, params):
+        row = self._connect().execute(query, params).fetchone()
+        if row is None:
+            return None
+        return {key: row[key] for key in row.keys() if key != "seq"}
+
+    def _connect(self):
+        # Opened on first use so importing this module touches no files
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS pdfs ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, pdf_id TEXT NOT NULL UNIQUE, "
+                "name TEXT, summary TEXT, content_hash TEXT, pages INTEGER, "
+                "chunks INTEGER, size_bytes INTEGER, created_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS pdfs_content_hash ON pdfs (content_hash)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS page_indexes ("
+                "pdf_id TEXT PRIMARY KEY, page_index TEXT NOT NULL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+            db.commit()
+            backfilled = db.execute(
+                "SELECT value FROM catalog_meta WHERE key = 'backfilled'"
+            ).fetchone()
+            if backfilled is None:
+                self._backfill(db)
+            self._db = db
+        return self._db
+
+    @staticmethod
+    def _backfill(db):
+        summaries = resources.get_collection(SUMMARY_COLLECTION)
+        collections = set(resources.list_collections())
+        now = time.time()
+        added = 0
+        while True:
+            batch = summaries.get(
+                limit=BACKFILL_BATCH_SIZE,
+                offset=added,
+                include=["documents", "metadatas"],
+            )
+            if not batch["ids"]:
+                break
+            rows = []
+            for pdf_id, summary, metadata in zip(
+                batch["ids"], batch["documents"], batch["metadatas"]
+            ):
+                rows.append(
+                    (
+                        pdf_id,
+                        summary,
+                        (metadata or {}).get("content_hash"),
+                        resources.get_collection(pdf_id).count()
+                        if pdf_id in collections
+                        else None,
+                        now,
+                    )
+                )
+            # INSERT OR IGNORE: another process may be backfilling too
+            db.executemany(
+                "INSERT OR IGNORE INTO pdfs (pdf_id, summary, content_hash, chunks, "
+                "created_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            added += len(batch["ids"])
+        db.execute("INSERT OR REPLACE INTO catalog_meta VALUES ('backfilled', ?)", (str(now),))
+        db.commit()
+        if added:
+            logger.info(f"Backfilled the PDF catalog with {added} existing PDFs")
+
+
+catalog = PDFCatalog(path=Config.CATALOG_PATH)
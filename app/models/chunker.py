@@ -0,0 +1,128 @@
+# app/models/chunker.py
+
+import bisect
+import re
+from app.utils.config import Config
+
+# Words and individual punctuation marks, close to what nltk.word_tokenize
+# counts. The lookahead stops the regex engine from splitting a word into
+# several tokens when it backtracks.
+TOKEN = r"(?:\w+(?!\w)|[^\w\s])"
+TOKEN_PATTERN = re.compile(TOKEN)
+LEADING_SPACE = re.compile(r"\s*")
+
+PAGE_SEPARATOR = "\n"
+
+
+def _window_pattern(step_tokens, overlap_tokens):
+    # One match covers a whole chunk; group 1 ends where the next chunk starts
+    pattern = rf"((?:\s*{TOKEN}){{{step_tokens}}})"
+    if overlap_tokens:
+        pattern += rf"(?:\s*{TOKEN}){{{overlap_tokens}}}"
+    return re.compile(pattern)
+
+
+class OffsetChunker:
+    """Split page texts into token-bounded chunks using character offsets.
+
+    Chunk text is sliced from the original page text, so spacing and
+    punctuation are preserved. Consecutive chunks share ``overlap_tokens``
+    tokens, and with ``cross_page`` a chunk may continue onto the next page.
+    Offsets are into the document formed by joining the page texts with
+    ``PAGE_SEPARATOR``.
+
+    Each chunk is found with a single regex match spanning ``max_tokens``
+    tokens, so no per-token Python objects are created. Pages are consumed
+    lazily and only text that is not yet fully chunked is kept in memory.
+    """
+
+    def __init__(self, max_tokens=None, overlap_tokens=None, cross_page=None):
+        self.max_tokens = max_tokens or Config.MAX_TOKENS
+        self.overlap_tokens = (
+            Config.CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+        )
+        if not 0 <= self.overlap_tokens < self.max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.cross_page = Config.CHUNK_CROSS_PAGES if cross_page is None else cross_page
+        self._window = _window_pattern(
+            self.max_tokens - self.overlap_tokens, self.overlap_tokens
+        )
+
+    def iter_chunks(self, page_texts):
+        self._chunk_id = 0
+        self._buffer = ""
+        self._buffer_start = 0  # document offset of self._buffer[0]
+        self._pos = 0  # buffer index where the next chunk starts
+        self._emitted_end = 0  # document offset where the last chunk ended
+        self._page_starts = []  # document offsets of the pages in the buffer
+        self._page_numbers = []
+
+        offset = 0
+        for page_index, page in enumerate(page_texts):
+            text = page["text"]
+            if page_index:
+                self._buffer += PAGE_SEPARATOR
+                offset += len(PAGE_SEPARATOR)
+            self._page_starts.append(offset)
+            self._page_numbers.append(page["page_number"])
+            self._buffer += text
+            offset += len(text)
+
+            while True:
+                match = self._window.match(self._buffer, self._pos)
+                if match is None:
+                    break
+                yield self._emit(self._pos, match.end())
+                self._pos = match.end(1)
+                self._trim()
+
+            if not self.cross_page:
+                yield from self._flush()
+                self._pos = len(self._buffer)
+                self._trim()
+
+        yield from self._flush()
+
+    def _flush(self):
+        # Emit the tokens after the last full window, unless they were all
+        # already included in the previous chunk's overlap
+        emitted_end = self._emitted_end - self._buffer_start
+        if TOKEN_PATTERN.search(self._buffer, max(self._pos, emitted_end)):
+            end = len(self._buffer.rstrip())
+            yield self._emit(self._pos, end)
+
+    def _emit(self, pos, end):
+        start = LEADING_SPACE.match(self._buffer, pos).end()
+        char_start = self._buffer_start + start
+        char_end = self._buffer_start + end
+        page_start = self._page_number_at(char_start)
+        page_end = self._page_number_at(char_end - 1)
+        self._emitted_end = char_end
+        chunk = {
+            "chunk_id": f"chunk_{self._chunk_id}",
+            "text": self._buffer[start:end],
+            "page_number": page_start,
+            "page_start": page_start,
+            "page_end": page_end,
+            "char_start": char_start,
+            "char_end": char_end,
+        }
+        self._chunk_id += 1
+        return chunk
+
+    def _page_number_at(self, offset):
+        index = bisect.bisect_right(self._page_starts, offset) - 1
+        return self._page_numbers[max(index, 0)]
+
+    def _trim(self):
+        # Drop buffered text (and pages) before the next chunk. The text is
+        # only re-sliced once at least half of it is dead, so long pages
+        # aren't copied once per chunk.
+        if self._pos and self._pos * 2 >= len(self._buffer):
+            self._buffer = self._buffer[self._pos :]
+            self._buffer_start += self._pos
+            self._pos = 0
+        index = bisect.bisect_right(self._page_starts, self._buffer_start + self._pos) - 1
+        if index > 0:
+            del self._page_starts[:index]
+            del self._page_numbers[:index]
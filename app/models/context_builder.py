@@ -0,0 +1,200 @@
+# app/models/context_builder.py
+
+import re
+from itertools import zip_longest
+from app.models.question_answering import CHARS_PER_TOKEN
+from app.utils.config import Config
+
+PASSAGE_SEPARATOR = "\n\n"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+# Most whitespace allowed between two chunks that are still merged (when
+# there is no overlap the next chunk starts after the whitespace)
+MAX_MERGE_GAP = 16
+
+
+def _chunk_key(chunk_id):
+    # "chunk_12" -> ("chunk", 12) and "r2_chunk_3" -> ("r2_chunk", 3): chunks
+    # with the same prefix and consecutive numbers were cut one after another
+    try:
+        prefix, number = chunk_id.rsplit("_", 1)
+        return prefix, int(number)
+    except (AttributeError, ValueError):
+        return None
+
+
+class ContextBuilder:
+    """Pack retrieved chunks into answer contexts under a token budget.
+
+    Hits are taken in rank order, skipping repeated ids and duplicate text,
+    until the next one would exceed ``max_tokens``. The chosen chunks are
+    put back in document order and contiguous ones are merged into a single
+    passage. Overlapping text is written once, using the chunk offsets.
+
+    With ``share_context``, ``build`` gives every question the same context
+    (the union of all their hits) whenever the union fits the budget, so the
+    Anthropic prompt cache can reuse it between the calls. That only pays
+    off when the calls are primed (see ``PROMPT_CACHE_PRIME``), which is the
+    default for it; otherwise each question gets its own packed context.
+    """
+
+    def __init__(self, max_tokens=None, share_context=None):
+        self.max_chars = (max_tokens or Config.CONTEXT_MAX_TOKENS) * CHARS_PER_TOKEN
+        if share_context is None:
+            share_context = Config.PROMPT_CACHE_ENABLED and Config.PROMPT_CACHE_PRIME
+        self.share_context = share_context
+
+    def build(self, results):
+        """Return one context per question (None if it retrieved nothing).
+
+        ``results`` is a Chroma query result with ids, documents and
+        metadatas, indexed by question.
+        """
+        per_question = self._hits_per_question(results)
+        if self.share_context and sum(1 for hits in per_question if hits) > 1:
+            # Round-robin by rank, so every question's best hits come first
+            union = [
+                hit
+                for rank in zip_longest(*per_question)
+                for hit in rank
+                if hit is not None
+            ]
+            context, complete = self._pack(union)
+            if complete:
+                return [context if hits else None for hits in per_question]
+        return [self._pack(hits)[0] if hits else None for hits in per_question]
+
+    def build_groups(self, results, max_questions=None):
+        """Group questions whose combined hits fit in one context.
+
+        Returns ``(context, question_indexes)`` pairs, with at most
+        ``max_questions`` questions per group. Questions are placed in the
+        first group that can take all of their hits. Questions that retrieved
+        nothing are left out.
+        """
+        max_questions = max_questions or Config.ANSWER_BATCH_MAX_QUESTIONS
+        groups = []
+        for index, hits in enumerate(self._hits_per_question(results)):
+            if not hits:
+                continue
+            for group in groups:
+                if len(group["indexes"]) < max_questions:
+                    context, complete = self._pack(group["hits"] + hits)
+                    if complete:
+                        group.update(context=context, hits=group["hits"] + hits)
+                        group["indexes"].append(index)
+                        break
+            else:
+                groups.append(
+                    {"context": self._pack(hits)[0], "hits": hits, "indexes": [index]}
+                )
+        return [(group["context"], group["indexes"]) for group in groups]
+
+    @staticmethod
+    def _hits_per_question(results):
+        return [
+            [
+                {"id": chunk_id, "text": text, "metadata": metadata or {}}
+                for chunk_id, text, metadata in zip(ids, documents, metadatas)
+            ]
+            for ids, documents, metadatas in zip(
+                results["ids"], results["documents"], results["metadatas"]
+            )
+        ]
+
+    def _pack(self, hits):
+        # Returns (context, whether every distinct hit made it in)
+        selected = []
+        seen_ids = set()
+        seen_texts = set()
+        complete = True
+        for hit in hits:
+            normalized = _WHITESPACE.sub(" ", hit["text"]).strip()
+            if hit["id"] in seen_ids or normalized in seen_texts:
+                continue
+            seen_ids.add(hit["id"])
+            seen_texts.add(normalized)
+            candidate = selected + [hit]
+            if selected and len(self._render(candidate)) > self.max_chars:
+                complete = False
+                continue
+            selected = candidate
+        context = self._render(selected)
+        if len(context) > self.max_chars:
+            # A single chunk bigger than the whole budget
+            context = context[: self.max_chars]
+            complete = False
+        return context, complete
+
+    def _render(self, hits):
+        return PASSAGE_SEPARATOR.join(
+            self._format_passage(passage) for passage in self._merge(hits)
+        )
+
+    def _merge(self, hits):
+        located = [hit for hit in hits if _chunk_key(hit["id"]) is not None]
+        unlocated = [hit for hit in hits if _chunk_key(hit["id"]) is None]
+        located.sort(
+            key=lambda hit: (hit["metadata"].get("char_start", -1), _chunk_key(hit["id"]))
+        )
+
+        passages = []
+        for hit in located:
+            key = _chunk_key(hit["id"])
+            metadata = hit["metadata"]
+            previous = passages[-1] if passages else None
+            if previous is not None and self._follows(previous, key, metadata):
+                previous["text"] = self._join(previous, hit)
+                previous["last_key"] = key
+                previous["page_end"] = metadata.get("page_end", previous["page_end"])
+                previous["char_end"] = metadata.get("char_end")
+                continue
+            passages.append(
+                {
+                    "text": hit["text"],
+                    "last_key": key,
+                    "page_start": metadata.get("page_start", metadata.get("page_number")),
+                    "page_end": metadata.get("page_end", metadata.get("page_number")),
+                    "char_end": metadata.get("char_end"),
+                }
+            )
+        passages.extend(
+            {
+                "text": hit["text"],
+                "page_start": hit["metadata"].get("page_number"),
+                "page_end": hit["metadata"].get("page_number"),
+            }
+            for hit in unlocated
+        )
+        return passages
+
+    @staticmethod
+    def _follows(passage, key, metadata):
+        prefix, number = passage["last_key"]
+        if key != (prefix, number + 1):
+            return False
+        # A re-ingested revision can put new text between two kept chunks
+        char_start, char_end = metadata.get("char_start"), passage["char_end"]
+        return char_start is None or char_end is None or char_start - char_end <= MAX_MERGE_GAP
+
+    @staticmethod
+    def _join(passage, hit):
+        # Consecutive chunks overlap by CHUNK_OVERLAP_TOKENS; with offsets the
+        # shared text can be cut exactly, otherwise the chunks are just joined
+        char_start = hit["metadata"].get("char_start")
+        char_end = passage["char_end"]
+        if char_start is not None and char_end is not None:
+            overlap = char_end - char_start
+            if overlap >= 0:
+                return passage["text"] + hit["text"][overlap:]
+        return f"{passage['text']} {hit['text']}"
+
+    @staticmethod
+    def _format_passage(passage):
+        start, end = passage["page_start"], passage["page_end"]
+        if start is None:
+            return passage["text"]
+        pages = f"Page {start}" if start == end or end is None else f"Pages {start}-{end}"
+        return f"[{pages}]\n{passage['text']}"
@@ -0,0 +1,131 @@
+# app/models/embedder.py
+
+import itertools
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from app.utils.config import Config
+from app.utils.logger import get_logger
+from app.utils.resources import resources
+
+logger = get_logger(__name__)
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+_worker_embedding_function = None
+
+
+def _init_worker():
+    # Each worker process loads its own copy of the embedding model
+    global _worker_embedding_function
+    from chromadb.utils import embedding_functions
+
+    _worker_embedding_function = embedding_functions.DefaultEmbeddingFunction()
+
+
+def _embed_in_worker(documents):
+    import numpy as np
+
+    return np.asarray(_worker_embedding_function(documents), dtype=np.float32)
+
+
+def _get_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=Config.EMBED_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _process_pool
+
+
+def _reset_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+def batched(iterable, batch_size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, batch_size)):
+        yield batch
+
+
+class ChunkEmbedder:
+    """Compute chunk embeddings in fixed-size batches on a process pool.
+
+    With ``workers`` > 1, batches are embedded by a pool of spawned
+    processes, each holding its own embedding model, with a bounded number
+    of batches in flight. Otherwise the shared in-process embedding function
+    is used. Batches are yielded in input order together with their vectors.
+    """
+
+    def __init__(self, workers=None, batch_size=None, registry=resources):
+        self.workers = workers or Config.EMBED_WORKERS
+        self.batch_size = batch_size or Config.EMBED_BATCH_SIZE
+        self.registry = registry
+
+    def embed_batches(self, text_chunks):
+        start = time.perf_counter()
+        total = 0
+        if self.workers > 1:
+            embedded = self._embed_in_pool(text_chunks)
+        else:
+            embedded = self._embed_in_process(text_chunks)
+        for batch, embeddings in embedded:
+            total += len(batch)
+            yield batch, embeddings
+
+        elapsed = time.perf_counter() - start
+        if total:
+            logger.info(
+                f"Embedded {total} chunks in {elapsed:.2f}s "
+                f"({total / elapsed:.1f} chunks/s, {self.workers} workers)"
+            )
+
+    def _embed_in_process(self, text_chunks):
+        embedding_function = self.registry.embedding_function
+        for batch in batched(text_chunks, self.batch_size):
+            yield batch, embedding_function([chunk["text"] for chunk in batch])
+
+    def _embed_in_pool(self, text_chunks):
+        batches = batched(text_chunks, self.batch_size)
+
+        def submit(batch):
+            try:
+                future = _get_process_pool().submit(
+                    _embed_in_worker, [chunk["text"] for chunk in batch]
+                )
+            except BrokenProcessPool:
+                _reset_process_pool()
+                future = None
+            return batch, future
+
+        # Keep every worker busy without reading the whole document ahead
+        in_flight = deque(
+            submit(batch) for batch in itertools.islice(batches, self.workers * 2)
+        )
+        while in_flight:
+            batch, future = in_flight.popleft()
+            next_batch = next(batches, None)
+            if next_batch is not None:
+                in_flight.append(submit(next_batch))
+            try:
+                if future is None:
+                    raise BrokenProcessPool("process pool was reset")
+                embeddings = future.result()
+            except Exception as e:
+                logger.warning(f"Embedding worker failed, embedding batch in-process: {e}")
+                if isinstance(e, BrokenProcessPool):
+                    _reset_process_pool()
+                embeddings = self.registry.embedding_function(
+                    [chunk["text"] for chunk in batch]
+                )
+            yield batch, embeddings
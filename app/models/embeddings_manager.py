@@ -1,92 +1,322 @@
 # app/models/embeddings_manager.py
 
-import chromadb
-from chromadb.utils import embedding_functions
+import json
+from app.models.answer_cache import answer_cache
+from app.models.catalog import catalog
+from app.models.embedder import ChunkEmbedder
+from app.models.semantic_cache import semantic_cache
+from app.models.summary_router import summary_router
 from app.utils.config import Config
 from app.utils.logger import get_logger
-from sentence_transformers import SentenceTransformer
+from app.utils.metrics import stage, timed_iter
+from app.utils.resources import resources, CHUNK_COLLECTION, SUMMARY_COLLECTION
 
 logger = get_logger(__name__)
-client = chromadb.PersistentClient(path=Config.CHROMADB_PERSIST_DIR)
+
+CHUNK_METADATA_KEYS = (
+    "chunk_id",
+    "page_number",
+    "page_start",
+    "page_end",
+    "char_start",
+    "char_end",
+)
 
 
 class EmbeddingsManager:
-    def __init__(self, pdf_id):
-        self.client = client
-        self.collection = self.client.get_or_create_collection(
-            name=pdf_id,
-            embedding_function=embedding_functions.DefaultEmbeddingFunction(),
-        )
+    """Chunks of one PDF in the vector store (``VECTOR_STORE``).
+
+    With ``VECTOR_LAYOUT=per_pdf`` the PDF has a collection of its own. With
+    ``shared``, all PDFs use one collection: chunks are stored with a
+    ``pdf_id`` metadata field and an id prefixed with the pdf_id, and every
+    read is filtered on the pdf_id. Callers see the same chunk ids either way.
+    """
+
+    def __init__(self, pdf_id, registry=resources, layout=None):
+        self.pdf_id = pdf_id
+        self.registry = registry
+        self.embedding_function = registry.embedding_function
+        self.shared = (layout or Config.VECTOR_LAYOUT) == "shared"
+        if self.shared:
+            self.collection = registry.get_collection(CHUNK_COLLECTION)
+            self._id_prefix = f"{pdf_id}:"
+            self._where = {"pdf_id": pdf_id}
+        else:
+            self.collection = registry.get_collection(pdf_id)
+            self._id_prefix = ""
+            self._where = None
+
+    def _stored_ids(self, chunk_ids):
+        return [self._id_prefix + chunk_id for chunk_id in chunk_ids]
+
+    def _chunk_ids(self, stored_ids):
+        return [stored_id[len(self._id_prefix) :] for stored_id in stored_ids]
+
+    def _strip_query_ids(self, results):
+        results["ids"] = [self._chunk_ids(ids) for ids in results["ids"]]
+        return results
 
-    def update_embeddings(self, text_chunks):
+    def update_embeddings(self, text_chunks, batch_size=None):
+        """Embed and add chunks to the collection in fixed-size batches.
+
+        ``text_chunks`` may be any iterable (e.g. a generator); only the
+        batches being embedded are held in memory. Vectors are computed by
+        ``ChunkEmbedder`` and passed to the store precomputed. Returns the number
+        of chunks added.
+        """
+        embedder = ChunkEmbedder(batch_size=batch_size, registry=self.registry)
+        total = 0
         try:
-            ids = [chunk["chunk_id"] for chunk in text_chunks]
-            documents = [chunk["text"] for chunk in text_chunks]
-            metadatas = [
-                {"chunk_id": chunk["chunk_id"], "page_number": chunk["page_number"]}
-                for chunk in text_chunks
-            ]
-            try:
-                self.collection.add(documents=documents, metadatas=metadatas, ids=ids)
-            except Exception as e:
-                logger.error("Error adding documents to collection")
-                raise e
-            logger.info(f"Embeddings updated for collection {self.collection.name}")
+            for batch, embeddings in timed_iter(
+                "embed", embedder.embed_batches(text_chunks)
+            ):
+                with stage("store"):
+                    self._add_batch(batch, embeddings)
+                total += len(batch)
+            logger.info(
+                f"Embeddings updated for collection {self.collection.name} ({total} chunks)"
+            )
+            return total
         except Exception as e:
             logger.error(f"Error updating embeddings: {e}")
             raise e
 
+    def _add_batch(self, text_chunks, embeddings):
+        ids = self._stored_ids(chunk["chunk_id"] for chunk in text_chunks)
+        documents = [chunk["text"] for chunk in text_chunks]
+        metadatas = [
+            {
+                key: chunk[key]
+                for key in CHUNK_METADATA_KEYS
+                if chunk.get(key) is not None
+            }
+            for chunk in text_chunks
+        ]
+        if self.shared:
+            for metadata in metadatas:
+                metadata["pdf_id"] = self.pdf_id
+        try:
+            self.collection.add(
+                documents=documents, embeddings=embeddings, metadatas=metadatas, ids=ids
+            )
+        except Exception as e:
+            logger.error("Error adding documents to collection")
+            raise e
+
+    def get_page_index(self):
+        """The page index saved by the last (re-)ingestion, or None.
+
+        ``{"revision": int, "pages": [[page_number, hash, length], ...]}``
+        for the pages that had text, in order. Kept in the collection
+        metadata, so it goes away with the collection; in the shared layout
+        it is kept in the catalog instead.
+        """
+        if self.shared:
+            return catalog.get_page_index(self.pdf_id)
+        page_index = (self.collection.metadata or {}).get("page_index")
+        return json.loads(page_index) if page_index else None
+
+    def set_page_index(self, page_index):
+        if self.shared:
+            catalog.set_page_index(self.pdf_id, page_index)
+        else:
+            self.collection.modify(metadata={"page_index": json.dumps(page_index)})
+
+    def get_chunk_metadata(self):
+        results = self.collection.get(where=self._where, include=["metadatas"])
+        return dict(zip(self._chunk_ids(results["ids"]), results["metadatas"]))
+
+    def update_chunk_metadata(self, metadatas, batch_size=None):
+        # Metadata-only update: the stored embeddings and documents are kept
+        ids = list(metadatas)
+        batch_size = batch_size or Config.EMBED_BATCH_SIZE
+        for i in range(0, len(ids), batch_size):
+            batch = ids[i : i + batch_size]
+            self.collection.update(
+                ids=self._stored_ids(batch),
+                metadatas=[metadatas[chunk_id] for chunk_id in batch],
+            )
+
+    def delete_chunks(self, ids, batch_size=None):
+        ids = list(ids)
+        batch_size = batch_size or Config.EMBED_BATCH_SIZE
+        for i in range(0, len(ids), batch_size):
+            self.collection.delete(ids=self._stored_ids(ids[i : i + batch_size]))
+
+    def delete_collection(self):
+        # All chunks of the PDF: its collection, or its part of the shared one
+        if self.shared:
+            self.collection.delete(where=self._where)
+        else:
+            self.registry.delete_collection(self.collection.name)
+
     def query_embeddings(self, question, n_results=3):
         try:
             results = self.collection.query(
-                query_texts=[question],
+                query_embeddings=self.embed_questions([question]),
                 n_results=n_results,
+                where=self._where,
                 include=["documents", "metadatas", "distances"],
             )
-            return results
+            return self._strip_query_ids(results)
         except Exception as e:
             logger.error(f"Error querying embeddings: {e}")
             raise e
 
+    def embed_questions(self, questions):
+        return self.embedding_function(list(questions))
+
+    def query_embeddings_batch(self, questions, n_results=3, query_embeddings=None):
+        """Retrieve the top ``n_results`` chunks for every question in one query.
+
+        All questions are embedded in a single model call (unless
+        ``query_embeddings`` are passed in). The result lists are indexed like
+        ``questions``.
+        """
+        if not questions:
+            return {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        try:
+            if query_embeddings is None:
+                query_embeddings = self.embed_questions(questions)
+            results = self.collection.query(
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                where=self._where,
+                include=["documents", "metadatas", "distances"],
+            )
+            return self._strip_query_ids(results)
+        except Exception as e:
+            logger.error(f"Error querying embeddings: {e}")
+            raise e
+
+
+def query_pdfs(pdf_ids, questions, n_results=3, query_embeddings=None, registry=resources):
+    """Retrieve the top ``n_results`` chunks per question across several PDFs.
+
+    Shaped like a Chroma query result. With more than one PDF, hits are
+    merged by distance and their ids become ``"{pdf_id}:{chunk_id}"`` so
+    chunks of different PDFs are never taken for neighbours.
+    """
+    if query_embeddings is None and len(pdf_ids) > 1:
+        # Embed once for all the PDFs
+        query_embeddings = registry.embedding_function(list(questions))
+    per_pdf = [
+        (
+            pdf_id,
+            EmbeddingsManager(pdf_id, registry=registry).query_embeddings_batch(
+                questions, n_results=n_results, query_embeddings=query_embeddings
+            ),
+        )
+        for pdf_id in pdf_ids
+    ]
+    if len(per_pdf) == 1:
+        return per_pdf[0][1]
+
+    merged = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+    for index in range(len(questions)):
+        hits = sorted(
+            (
+                (distance, f"{pdf_id}:{chunk_id}", document, metadata)
+                for pdf_id, results in per_pdf
+                for chunk_id, document, metadata, distance in zip(
+                    results["ids"][index],
+                    results["documents"][index],
+                    results["metadatas"][index],
+                    results["distances"][index],
+                )
+            ),
+            key=lambda hit: hit[0],
+        )[:n_results]
+        merged["distances"].append([hit[0] for hit in hits])
+        merged["ids"].append([hit[1] for hit in hits])
+        merged["documents"].append([hit[2] for hit in hits])
+        merged["metadatas"].append([hit[3] for hit in hits])
+    return merged
+
 
 def get_summary_collection():
-    return client.get_or_create_collection(name="pdf_summaries")
+    return resources.get_collection(SUMMARY_COLLECTION)
 
 
-def add_pdf_summary(pdf_id: str, summary: str):
+def add_pdf_summary(pdf_id: str, summary: str, content_hash: str = None):
     col = get_summary_collection()
     # Use pdf_id as id, summary as document
-    # metadata includes pdf_id
-    col.add(documents=[summary], metadatas=[{"pdf_id": pdf_id}], ids=[pdf_id])
+    # metadata includes pdf_id and, when known, the sha256 of the uploaded file
+    metadata = {"pdf_id": pdf_id}
+    if content_hash:
+        metadata["content_hash"] = content_hash
+    # Embedded here once, for both the summary collection and the routing matrix
+    embedding = resources.embedding_function([summary])[0]
+    col.add(
+        documents=[summary], embeddings=[embedding], metadatas=[metadata], ids=[pdf_id]
+    )
+    summary_router.add(pdf_id, embedding)
+
+
+def update_pdf_summary(pdf_id: str, summary: str = None, content_hash: str = None):
+    # Without a new summary only the metadata changes, so nothing is re-embedded
+    col = get_summary_collection()
+    metadata = {"pdf_id": pdf_id}
+    if content_hash:
+        metadata["content_hash"] = content_hash
+    if summary is None:
+        col.update(ids=[pdf_id], metadatas=[metadata])
+    else:
+        embedding = resources.embedding_function([summary])[0]
+        col.update(
+            ids=[pdf_id], documents=[summary], embeddings=[embedding], metadatas=[metadata]
+        )
+        summary_router.add(pdf_id, embedding)
+
+
+def get_pdf_summary(pdf_id: str):
+    existing = catalog.get(pdf_id)
+    if existing is None:
+        return None
+    return {
+        "pdf_id": pdf_id,
+        "summary": existing["summary"],
+        "content_hash": existing["content_hash"],
+    }
+
+
+def find_pdf_by_hash(content_hash: str):
+    existing = catalog.find_by_hash(content_hash)
+    if existing is None:
+        return None
+    return {"pdf_id": existing["pdf_id"], "summary": existing["summary"]}
 
 
 def query_pdf_summaries(query: str, top_k: int = 1):
     col = get_summary_collection()
-    results = col.query(query_texts=[query], n_results=top_k)
+    results = col.query(
+        query_embeddings=resources.embedding_function([query]), n_results=top_k
+    )
     return results
 
 
 def delete_pdf_data(pdf_id: str) -> bool:
     # delete pdf id from summaries and collection
 
-    collection = get_summary_collection()
-    existing_items = collection.get(ids=[pdf_id])
-
-    if not existing_items["ids"]:
+    # The catalog answers whether the PDF exists without listing collections
+    if catalog.get(pdf_id) is None:
         return False
 
     # Delete the PDF summary and associated embeddings
-    collection.delete(ids=[pdf_id])
+    get_summary_collection().delete(ids=[pdf_id])
+    summary_router.remove(pdf_id)
+    answer_cache.invalidate(pdf_id)
+    semantic_cache.invalidate(pdf_id)
 
     # now the chunks db
+    try:
+        if Config.VECTOR_LAYOUT == "shared":
+            EmbeddingsManager(pdf_id).delete_collection()
+        else:
+            resources.delete_collection(pdf_id)
+    except Exception as e:
+        # e.g. an ingestion that failed before creating it
+        logger.warning(f"Could not delete chunks of {pdf_id}: {e}")
 
-    # List existing collections
-    collections = client.list_collections()
-    collection_names = [col.name for col in collections]
-    # Check if the collection exists
-    if pdf_id not in collection_names:
-        return False
-
-    # Delete the collection
-    client.delete_collection(name=pdf_id)
+    catalog.delete(pdf_id)
     return True
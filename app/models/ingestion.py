@@ -0,0 +1,348 @@
+# app/models/ingestion.py
+
+import bisect
+import difflib
+import hashlib
+import os
+import threading
+from app.models.answer_cache import answer_cache
+from app.models.semantic_cache import semantic_cache
+from app.models.catalog import catalog
+from app.models.chunker import PAGE_SEPARATOR, TOKEN_PATTERN, OffsetChunker
+from app.models.pdf_processor import PDFProcessor
+from app.models.embeddings_manager import (
+    EmbeddingsManager,
+    add_pdf_summary,
+    get_pdf_summary,
+    get_summary_collection,
+    update_pdf_summary,
+)
+from app.models.question_answering import QuestionAnswering, SectionSummarizer
+from app.models.summary_router import summary_router
+from app.utils.config import Config
+from app.utils.logger import get_logger
+from app.utils.metrics import StageTimer, stage, timed_iter
+
+logger = get_logger(__name__)
+
+
+def _noop_report(stage, progress):
+    pass
+
+
+def page_hash(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _page_entry(page):
+    return [page["page_number"], page_hash(page["text"]), len(page["text"])]
+
+
+def ingest_pdf(
+    pdf_id: str, pdf_path, content_hash=None, name=None, report=_noop_report
+) -> dict:
+    """Extract, chunk, embed and summarize the PDF at ``pdf_path``.
+
+    Pages are streamed through chunking into batched Chroma writes, so memory
+    use does not grow with the page count, and are fed to a map-reduce
+    summarizer whose section summaries run while the rest is embedded.
+    ``report(stage, progress)`` is called as the pipeline advances, with
+    ``progress`` in the range 0..1. The PDF is added to the catalog under
+    ``name`` (the uploaded filename) once it is fully ingested.
+    """
+    pdf_processor = PDFProcessor()
+    question_answering = QuestionAnswering()
+    summarizer = SectionSummarizer(question_answering)
+    embeddings_manager = EmbeddingsManager(pdf_id)
+    summarize_timer = StageTimer("summarize")
+    pages_index = []
+
+    def pages_for_summary_and_chunks():
+        for page in timed_iter("extract", pdf_processor.iter_pages(pdf_path)):
+            pages_index.append(_page_entry(page))
+            # Only blocks when section summaries fall behind
+            with summarize_timer:
+                summarizer.add_text(page["text"])
+            report("embedding", 0.8 * page["page_number"] / max(pdf_processor.num_pages, 1))
+            yield page
+
+    report("extracting", 0.0)
+    try:
+        num_chunks = embeddings_manager.update_embeddings(
+            timed_iter("chunk", pdf_processor.iter_chunks(pages_for_summary_and_chunks()))
+        )
+
+        # Lets replace_pdf re-embed only the pages a new revision changes
+        embeddings_manager.set_page_index({"revision": 0, "pages": pages_index})
+
+        report("summarizing", 0.8)
+        with summarize_timer:
+            pdf_summary = summarizer.finish()
+        summarize_timer.record()
+        with stage("store"):
+            add_pdf_summary(pdf_id=pdf_id, summary=pdf_summary, content_hash=content_hash)
+            catalog.add(
+                pdf_id,
+                pdf_summary,
+                content_hash=content_hash,
+                name=name,
+                pages=pdf_processor.num_pages,
+                chunks=num_chunks,
+                size_bytes=os.path.getsize(pdf_path),
+            )
+    except Exception:
+        summarizer.close()
+        # Don't leave a half-written chunk collection, or a summary that
+        # questions could be routed to, behind
+        try:
+            embeddings_manager.delete_collection()
+            get_summary_collection().delete(ids=[pdf_id])
+            summary_router.remove(pdf_id)
+            catalog.delete(pdf_id)
+        except Exception as e:
+            logger.warning(f"Could not clean up collection for {pdf_id}: {e}")
+        raise
+
+    logger.info(
+        f"Ingested PDF {pdf_id} ({pdf_processor.num_pages} pages, {num_chunks} chunks)"
+    )
+    return {
+        "pdf_id": pdf_id,
+        "summary": pdf_summary,
+        "failed_pages": [error["page_number"] for error in pdf_processor.page_errors],
+    }
+
+
+# pdf_id -> [lock, number of replacements holding or waiting for it]; an
+# entry is removed when the last of them is done
+_replace_locks = {}
+_replace_locks_guard = threading.Lock()
+
+
+def replace_pdf(
+    pdf_id: str, pdf_path, content_hash=None, name=None, report=_noop_report
+) -> dict:
+    """Re-ingest a new revision of ``pdf_id``, re-embedding only what changed.
+
+    Pages are matched to the previous revision by content hash. Chunks that
+    lie entirely in unchanged pages are kept; only their offset and page
+    metadata is updated. Chunks touching a changed page are deleted, and
+    the text they covered is chunked and embedded again. The summary is
+    regenerated only when at least ``REPLACE_RESUMMARIZE_RATIO`` of the text
+    changed. Documents without a page index, or not chunked by the offset
+    chunker, are re-chunked in full. Replacements of one pdf_id run one at
+    a time.
+    """
+    with _replace_locks_guard:
+        entry = _replace_locks.setdefault(pdf_id, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            return _replace_pdf(pdf_id, pdf_path, content_hash, name, report)
+    finally:
+        with _replace_locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _replace_locks[pdf_id]
+
+
+def _replace_pdf(pdf_id, pdf_path, content_hash, name, report):
+    pdf_processor = PDFProcessor()
+    embeddings_manager = EmbeddingsManager(pdf_id)
+
+    report("extracting", 0.0)
+    with stage("extract"):
+        pages = pdf_processor.extract_text_from_pdf(pdf_path)
+    new_index = [_page_entry(page) for page in pages]
+    document = PAGE_SEPARATOR.join(page["text"] for page in pages)
+
+    report("embedding", 0.3)
+    old_page_index = embeddings_manager.get_page_index()
+    old_chunks = embeddings_manager.get_chunk_metadata()
+    revision = (old_page_index or {}).get("revision", 0) + 1
+    incremental = (
+        old_page_index is not None
+        and Config.CHUNKER != "nltk"
+        and all(
+            "char_start" in metadata and "page_start" in metadata
+            for metadata in old_chunks.values()
+        )
+    )
+    if incremental:
+        plan = _plan_replacement(old_page_index["pages"], new_index, old_chunks, document)
+        new_chunks = list(_chunk_gaps(document, new_index, plan["gaps"], revision))
+    else:
+        plan = {
+            "kept": {},
+            "deleted": list(old_chunks),
+            "changed_pages": len(new_index),
+            "changed_ratio": 1.0,
+        }
+        new_chunks = [
+            {**chunk, "chunk_id": f"r{revision}_{chunk['chunk_id']}"}
+            for chunk in pdf_processor.iter_chunks(pages)
+        ]
+
+    # New chunks go in before the old ones go away, so queries running
+    # meanwhile never see a hole
+    embeddings_manager.update_embeddings(new_chunks)
+    moved = {
+        chunk_id: metadata
+        for chunk_id, metadata in plan["kept"].items()
+        if metadata != old_chunks[chunk_id]
+    }
+    # A replace that failed after storing its chunks but before its summary
+    # leaves a flag in the page index, so the retry summarizes even though
+    # no pages changed since
+    resummarize = plan["changed_ratio"] >= Config.REPLACE_RESUMMARIZE_RATIO or bool(
+        (old_page_index or {}).get("resummarize_pending")
+    )
+    page_index = {"revision": revision, "pages": new_index}
+    with stage("store"):
+        embeddings_manager.update_chunk_metadata(moved)
+        embeddings_manager.delete_chunks(plan["deleted"])
+        embeddings_manager.set_page_index({**page_index, "resummarize_pending": resummarize})
+
+    summary = None
+    if resummarize:
+        report("summarizing", 0.8)
+        summarizer = SectionSummarizer(QuestionAnswering())
+        with stage("summarize"):
+            for page in pages:
+                summarizer.add_text(page["text"])
+            summary = summarizer.finish()
+    with stage("store"):
+        update_pdf_summary(pdf_id, summary=summary, content_hash=content_hash)
+        catalog.update(
+            pdf_id,
+            summary=summary,
+            content_hash=content_hash,
+            name=name,
+            pages=pdf_processor.num_pages,
+            chunks=len(plan["kept"]) + len(new_chunks),
+            size_bytes=os.path.getsize(pdf_path),
+        )
+        if resummarize:
+            embeddings_manager.set_page_index(page_index)
+    answer_cache.invalidate(pdf_id)
+    semantic_cache.invalidate(pdf_id)
+
+    if summary is None:
+        summary = (get_pdf_summary(pdf_id) or {}).get("summary", "")
+    logger.info(
+        f"Replaced PDF {pdf_id} (revision {revision}): {plan['changed_pages']} of "
+        f"{len(new_index)} pages changed, {len(new_chunks)} chunks added, "
+        f"{len(plan['deleted'])} deleted, {len(plan['kept'])} kept"
+    )
+    return {
+        "pdf_id": pdf_id,
+        "summary": summary,
+        "failed_pages": [error["page_number"] for error in pdf_processor.page_errors],
+        "replace": {
+            "revision": revision,
+            "pages": len(new_index),
+            "changed_pages": plan["changed_pages"],
+            "changed_ratio": plan["changed_ratio"],
+            "chunks_kept": len(plan["kept"]),
+            "chunks_added": len(new_chunks),
+            "chunks_deleted": len(plan["deleted"]),
+            "resummarized": resummarize,
+        },
+    }
+
+
+def _page_starts(page_index):
+    starts, offset = [], 0
+    for _, _, length in page_index:
+        starts.append(offset)
+        offset += length + len(PAGE_SEPARATOR)
+    return starts
+
+
+def _plan_replacement(old_pages, new_pages, old_chunks, document):
+    # Match pages by hash, keep the chunks that fall inside one run of
+    # matched pages (shifting their offsets), and find the text no kept
+    # chunk covers
+    matcher = difflib.SequenceMatcher(
+        None, [page[1] for page in old_pages], [page[1] for page in new_pages], autojunk=False
+    )
+    matched = {}  # old page position -> (run, new page position)
+    for run, (i, j, size) in enumerate(matcher.get_matching_blocks()):
+        for k in range(size):
+            matched[i + k] = (run, j + k)
+    old_starts = _page_starts(old_pages)
+    new_starts = _page_starts(new_pages)
+    old_position = {page[0]: position for position, page in enumerate(old_pages)}
+
+    kept, deleted = {}, []
+    for chunk_id, metadata in old_chunks.items():
+        first = old_position.get(metadata["page_start"])
+        last = old_position.get(metadata.get("page_end", metadata["page_start"]))
+        runs = (
+            {matched.get(k, (None,))[0] for k in range(first, last + 1)}
+            if first is not None and last is not None
+            else {None}
+        )
+        if len(runs) != 1 or None in runs:
+            deleted.append(chunk_id)
+            continue
+        new_first, new_last = matched[first][1], matched[last][1]
+        shift = new_starts[new_first] - old_starts[first]
+        kept[chunk_id] = {
+            **metadata,
+            "char_start": metadata["char_start"] + shift,
+            "char_end": metadata["char_end"] + shift,
+            "page_number": new_pages[new_first][0],
+            "page_start": new_pages[new_first][0],
+            "page_end": new_pages[new_last][0],
+        }
+
+    gaps, covered = [], 0
+    for metadata in sorted(kept.values(), key=lambda m: m["char_start"]):
+        if metadata["char_start"] > covered:
+            gaps.append((covered, metadata["char_start"]))
+        covered = max(covered, metadata["char_end"])
+    gaps.append((covered, len(document)))
+    gaps = [(start, end) for start, end in gaps if TOKEN_PATTERN.search(document, start, end)]
+
+    matched_new = {position for _, position in matched.values()}
+    matched_chars = sum(new_pages[position][2] for position in matched_new)
+    total_chars = max(
+        sum(page[2] for page in old_pages), sum(page[2] for page in new_pages), 1
+    )
+    return {
+        "kept": kept,
+        "deleted": deleted,
+        "gaps": gaps,
+        "changed_pages": len(new_pages) - len(matched_new),
+        "changed_ratio": 1 - matched_chars / total_chars,
+    }
+
+
+def _chunk_gaps(document, page_index, gaps, revision):
+    # Chunk each uncovered span of the new document. Ids carry the revision,
+    # and numbering skips one between spans so chunks of different spans
+    # never look consecutive to ContextBuilder.
+    starts = _page_starts(page_index)
+    numbers = [page[0] for page in page_index]
+
+    def page_at(offset):
+        return numbers[max(bisect.bisect_right(starts, offset) - 1, 0)]
+
+    number = 0
+    for gap_start, gap_end in gaps:
+        text = document[gap_start:gap_end]
+        for chunk in OffsetChunker().iter_chunks([{"page_number": 0, "text": text}]):
+            char_start = chunk["char_start"] + gap_start
+            char_end = chunk["char_end"] + gap_start
+            yield {
+                **chunk,
+                "chunk_id": f"r{revision}_chunk_{number}",
+                "page_number": page_at(char_start),
+                "page_start": page_at(char_start),
+                "page_end": page_at(char_end - 1),
+                "char_start": char_start,
+                "char_end": char_end,
+            }
+            number += 1
+        number += 1
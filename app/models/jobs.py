@@ -0,0 +1,159 @@
+# app/models/jobs.py
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from app.utils.config import Config
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class JobQueueFullError(Exception):
+    pass
+
+
+class JobManager:
+    """Runs blocking ingestion work on a bounded thread pool and tracks its status.
+
+    Finished jobs are kept in memory (oldest evicted first) so clients can poll
+    for the result after the work is done.
+    """
+
+    def __init__(self, max_workers, max_pending, max_finished):
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ingest"
+        )
+        self._jobs = OrderedDict()
+        self._futures = {}  # job_id -> executor future, while the job is known
+        self._lock = threading.Lock()
+
+    def submit(self, fn, pdf_id, *args, key=None, **kwargs) -> dict:
+        """Queue ``fn(pdf_id, *args, report=..., **kwargs)`` and return its job.
+
+        If a job with the same ``key`` is still queued or running, that job is
+        returned instead and ``fn`` is not queued again.
+        """
+        with self._lock:
+            if key is not None:
+                existing = self._pending(key)
+                if existing is not None:
+                    return dict(existing)
+            pending = [
+                job for job in self._jobs.values() if job["status"] in ("queued", "running")
+            ]
+            if len(pending) >= self.max_pending:
+                raise JobQueueFullError(f"{len(pending)} ingestion jobs already pending")
+
+            job = self._new_job(pdf_id, key, status="queued")
+            self._jobs[job["job_id"]] = job
+            snapshot = dict(job)
+            self._futures[job["job_id"]] = self._executor.submit(
+                self._run, job["job_id"], fn, (pdf_id,) + args, kwargs
+            )
+        return snapshot
+
+    def pending(self, key):
+        """The queued or running job submitted with ``key``, if any."""
+        with self._lock:
+            job = self._pending(key)
+            return dict(job) if job else None
+
+    def _pending(self, key):
+        for job in self._jobs.values():
+            if job["key"] == key and job["status"] in ("queued", "running"):
+                return job
+        return None
+
+    def add_completed(self, pdf_id, result) -> dict:
+        """Record a job that finished without running, e.g. a duplicate upload."""
+        with self._lock:
+            job = self._new_job(
+                pdf_id, None, status="completed", stage="done", progress=1.0, result=result
+            )
+            self._jobs[job["job_id"]] = job
+            snapshot = dict(job)
+        self._prune()
+        return snapshot
+
+    def get(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def future(self, job_id: str):
+        """A future that completes when the job finishes (None if it never ran).
+
+        The job's outcome is not in the future; read it with ``get``.
+        """
+        with self._lock:
+            return self._futures.get(job_id)
+
+    def report(self, job_id: str, stage: str, progress: float):
+        self._update(job_id, stage=stage, progress=progress)
+
+    def _new_job(self, pdf_id, key, **fields):
+        now = time.time()
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "pdf_id": pdf_id,
+            "key": key,
+            "status": "queued",
+            "stage": "queued",
+            "progress": 0.0,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        job.update(fields)
+        return job
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job_id, fn, args, kwargs):
+        self._update(job_id, status="running")
+        try:
+            result = fn(
+                *args, report=lambda s, p: self.report(job_id, s, p), **kwargs
+            )
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            self._update(job_id, status="failed", error=str(e))
+        else:
+            self._update(
+                job_id, status="completed", stage="done", progress=1.0, result=result
+            )
+        finally:
+            self._prune()
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            job["updated_at"] = time.time()
+
+    def _prune(self):
+        with self._lock:
+            finished = [
+                job_id
+                for job_id, job in self._jobs.items()
+                if job["status"] in ("completed", "failed")
+            ]
+            for job_id in finished[: max(0, len(finished) - self.max_finished)]:
+                del self._jobs[job_id]
+                self._futures.pop(job_id, None)
+
+
+job_manager = JobManager(
+    max_workers=Config.INGEST_WORKERS,
+    max_pending=Config.INGEST_MAX_PENDING_JOBS,
+    max_finished=Config.INGEST_MAX_FINISHED_JOBS,
+)
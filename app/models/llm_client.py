@@ -0,0 +1,314 @@
+# app/models/llm_client.py
+
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from concurrent.futures import Future
+from app.models.question_answering import CHARS_PER_TOKEN
+from app.utils.config import Config
+from app.utils.logger import get_logger
+from app.utils.metrics import (
+    LLM_COALESCED,
+    LLM_RETRIES,
+    LLM_THROTTLED_SECONDS,
+    llm_call,
+    record_llm_usage,
+)
+
+logger = get_logger(__name__)
+
+# Retried besides 5xx (which includes 529, "overloaded"), as in the SDK
+RETRYABLE_STATUS_CODES = (408, 409, 429)
+
+
+class LLMUnavailableError(Exception):
+    """Anthropic kept refusing a call (rate limit, overload or no connection).
+
+    Raised once the retries are used up. ``retry_after`` is the wait the API
+    last asked for, in seconds, if it said.
+    """
+
+    def __init__(self, message, retry_after=None, rate_limited=False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.rate_limited = rate_limited
+
+
+class RateLimiter:
+    """Client-side requests and tokens per minute budget, as token buckets.
+
+    ``reserve`` takes a call's cost from the buckets at once and returns how
+    long the caller must wait before sending it. A bucket may go negative,
+    so callers queue up behind each other instead of all retrying when the
+    budget refills. A limit of 0 disables its bucket.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self._lock = threading.Lock()
+        self._requests = _Bucket(requests_per_minute)
+        self._tokens = _Bucket(tokens_per_minute)
+        self._paused_until = 0.0
+
+    def reserve(self, tokens):
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._paused_until - now)
+            for bucket, cost in ((self._requests, 1), (self._tokens, tokens)):
+                wait = max(wait, bucket.take(cost, now))
+            return wait
+
+    def refund(self, tokens):
+        # Give back what a call was estimated to use but did not
+        with self._lock:
+            self._tokens.give(tokens, time.monotonic())
+
+    def pause(self, seconds):
+        # The API asked us to back off; hold every caller, not just this one
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class _Bucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def take(self, cost, now):
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        self.level -= min(cost, self.capacity)
+        return -self.level / self.rate if self.level < 0 else 0.0
+
+    def give(self, amount, now):
+        if self.capacity:
+            self._refill(now)
+            self.level = min(self.capacity, self.level + amount)
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class LLMClient:
+    """Anthropic Messages calls with rate limiting, retries and coalescing.
+
+    Every call of the process goes through here (see
+    ``ResourceRegistry.llm``):
+
+    - The call's cost (one request, plus its estimated input tokens and
+      ``max_tokens``) is reserved from ``LLM_REQUESTS_PER_MINUTE`` and
+      ``LLM_TOKENS_PER_MINUTE`` first, waiting if the budget is spent. The
+      tokens not actually used are given back afterwards.
+    - Rate limits (429), overload and server errors, and connection errors
+      are retried up to ``LLM_MAX_RETRIES`` times with full-jitter
+      exponential backoff. A ``retry-after`` from the API is honoured, and
+      pauses all other calls too. When retries run out,
+      ``LLMUnavailableError`` is raised.
+    - Identical requests in flight at the same time (same model, prompt and
+      parameters) share one call. Streamed calls are not coalesced.
+
+    The SDK clients are created with their own retries disabled.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.limiter = RateLimiter(
+            Config.LLM_REQUESTS_PER_MINUTE, Config.LLM_TOKENS_PER_MINUTE
+        )
+        self._lock = threading.Lock()
+        self._in_flight = {}  # key -> Future (sync) or asyncio.Task (async)
+
+    def create(self, purpose, **request):
+        if not Config.LLM_COALESCE:
+            return self._create(purpose, request)
+        key = ("sync", _request_key(request))
+        with self._lock:
+            shared = self._in_flight.get(key)
+            if shared is None:
+                shared = self._in_flight[key] = Future()
+                leader = True
+            else:
+                leader = False
+        if not leader:
+            LLM_COALESCED.labels(purpose=purpose).inc()
+            return shared.result()
+        try:
+            response = self._create(purpose, request)
+            shared.set_result(response)
+            return response
+        except BaseException as e:
+            shared.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    async def acreate(self, purpose, **request):
+        if not Config.LLM_COALESCE:
+            return await self._acreate(purpose, request)
+        key = ("async", _request_key(request))
+        with self._lock:
+            task = self._in_flight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._acreate(purpose, request))
+                self._in_flight[key] = task
+                task.add_done_callback(lambda _: self._forget(key, task))
+            else:
+                LLM_COALESCED.labels(purpose=purpose).inc()
+        # Shielded so one caller timing out doesn't cancel the call for the
+        # others sharing it
+        return await asyncio.shield(task)
+
+    async def astream(self, purpose, on_delta, **request):
+        """Stream a message, calling ``on_delta`` with each piece of text.
+
+        Returns the final message. A failure is only retried while no text
+        has been passed on yet.
+        """
+        model = request["model"]
+        estimate = _estimate_tokens(request)
+        for attempt in range(Config.LLM_MAX_RETRIES + 1):
+            await self._athrottle(purpose, estimate)
+            streamed = False
+            try:
+                with llm_call(purpose, model):
+                    async with self.registry.async_anthropic.messages.stream(
+                        **request
+                    ) as stream:
+                        async for text in stream.text_stream:
+                            streamed = True
+                            on_delta(text)
+                        response = await stream.get_final_message()
+            except Exception as e:
+                if streamed:
+                    raise
+                await asyncio.sleep(self._retry_delay(purpose, e, attempt, estimate))
+                continue
+            self._settle(purpose, model, estimate, response)
+            return response
+
+    def _create(self, purpose, request):
+        model = request["model"]
+        estimate = _estimate_tokens(request)
+        for attempt in range(Config.LLM_MAX_RETRIES + 1):
+            wait = self.limiter.reserve(estimate)
+            if wait:
+                LLM_THROTTLED_SECONDS.labels(purpose=purpose).inc(wait)
+                time.sleep(wait)
+            try:
+                with llm_call(purpose, model):
+                    response = self.registry.anthropic.messages.create(**request)
+            except Exception as e:
+                time.sleep(self._retry_delay(purpose, e, attempt, estimate))
+                continue
+            self._settle(purpose, model, estimate, response)
+            return response
+
+    async def _acreate(self, purpose, request):
+        model = request["model"]
+        estimate = _estimate_tokens(request)
+        for attempt in range(Config.LLM_MAX_RETRIES + 1):
+            await self._athrottle(purpose, estimate)
+            try:
+                with llm_call(purpose, model):
+                    response = await self.registry.async_anthropic.messages.create(
+                        **request
+                    )
+            except Exception as e:
+                await asyncio.sleep(self._retry_delay(purpose, e, attempt, estimate))
+                continue
+            self._settle(purpose, model, estimate, response)
+            return response
+
+    async def _athrottle(self, purpose, estimate):
+        wait = self.limiter.reserve(estimate)
+        if wait:
+            LLM_THROTTLED_SECONDS.labels(purpose=purpose).inc(wait)
+            await asyncio.sleep(wait)
+
+    def _settle(self, purpose, model, estimate, response):
+        record_llm_usage(purpose, model, response.usage)
+        usage = response.usage
+        if usage is not None:
+            used = (usage.input_tokens or 0) + (usage.output_tokens or 0)
+            self.limiter.refund(estimate - used)
+
+    def _retry_delay(self, purpose, error, attempt, estimate):
+        """Seconds to wait before retrying ``error``, or raise it."""
+        # The call was refused, so its tokens were not used
+        self.limiter.refund(estimate)
+        status = getattr(error, "status_code", None)
+        retryable = _is_retryable(error, status)
+        retry_after = _retry_after(error)
+        if not retryable:
+            raise error
+        if attempt >= Config.LLM_MAX_RETRIES:
+            logger.error(f"Giving up on LLM call after {attempt + 1} attempts: {error}")
+            raise LLMUnavailableError(
+                f"Anthropic API unavailable: {error}",
+                retry_after=retry_after,
+                rate_limited=status == 429,
+            ) from error
+        backoff = random.uniform(
+            0,
+            min(Config.LLM_BACKOFF_MAX_SECONDS, Config.LLM_BACKOFF_BASE_SECONDS * 2**attempt),
+        )
+        if retry_after is not None:
+            # Jitter on top, so callers told the same wait don't return at once
+            backoff = retry_after + random.uniform(0, Config.LLM_BACKOFF_BASE_SECONDS)
+            self.limiter.pause(retry_after)
+        reason = "rate_limit" if status == 429 else str(status or "connection")
+        LLM_RETRIES.labels(purpose=purpose, reason=reason).inc()
+        logger.warning(
+            f"LLM call failed ({reason}), retry {attempt + 1} of "
+            f"{Config.LLM_MAX_RETRIES} in {backoff:.2f}s"
+        )
+        return backoff
+
+    def _forget(self, key, task):
+        with self._lock:
+            if self._in_flight.get(key) is task:
+                del self._in_flight[key]
+        if not task.cancelled():
+            # Mark a failure as seen even if every caller gave up waiting
+            task.exception()
+
+
+def _is_retryable(error, status):
+    import anthropic
+
+    if isinstance(error, anthropic.APIConnectionError):
+        return True
+    return status is not None and (status in RETRYABLE_STATUS_CODES or status >= 500)
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    for header, scale in (("retry-after-ms", 1000), ("retry-after", 1)):
+        try:
+            return max(0.0, float(headers[header]) / scale)
+        except (KeyError, ValueError):
+            continue
+    return None
+
+
+def _estimate_tokens(request):
+    # Input from the size of the prompt, plus the most the model may write
+    prompt = json.dumps(
+        [request.get("system"), request.get("messages"), request.get("tools")], default=str
+    )
+    return len(prompt) // CHARS_PER_TOKEN + request.get("max_tokens", 0)
+
+
+def _request_key(request):
+    encoded = json.dumps(request, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
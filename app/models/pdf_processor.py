@@ -1,52 +1,199 @@
 # app/models/pdf_processor.py
 
+import itertools
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import PyPDF2
-import nltk
+from app.models.chunker import OffsetChunker
 from app.utils.config import Config
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
-nltk.download("punkt_tab")
+
+_nltk_ready = False
+_nltk_lock = threading.Lock()
+
+
+def _load_nltk():
+    # nltk is slow to import and its tokenizer data used to be downloaded at
+    # import time; load both on first use, preferring a local data directory
+    global _nltk_ready
+    import nltk
+
+    with _nltk_lock:
+        if not _nltk_ready:
+            if Config.NLTK_DATA_DIR and Config.NLTK_DATA_DIR not in nltk.data.path:
+                nltk.data.path.insert(0, Config.NLTK_DATA_DIR)
+            try:
+                nltk.data.find("tokenizers/punkt_tab")
+            except LookupError:
+                if not Config.NLTK_DOWNLOAD:
+                    raise
+                logger.info("Downloading nltk punkt_tab tokenizer data")
+                nltk.download("punkt_tab", download_dir=Config.NLTK_DATA_DIR or None)
+            _nltk_ready = True
+    return nltk
+
+
+MAX_PAGES_PER_RANGE = 32
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def _get_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # spawn, not fork: the parent runs ingestion on worker threads
+            _process_pool = ProcessPoolExecutor(
+                max_workers=Config.EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _process_pool
+
+
+def _reset_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+def _extract_pages(pdf_reader, start, stop):
+    page_texts = []
+    page_errors = []
+    for page_num in range(start, stop):
+        try:
+            text = pdf_reader.pages[page_num].extract_text()
+        except Exception as e:
+            page_errors.append({"page_number": page_num + 1, "error": str(e)})
+            continue
+        if text:
+            page_texts.append({"page_number": page_num + 1, "text": text})
+    return page_texts, page_errors
+
+
+def _extract_page_range(pdf_path, start, stop):
+    # Runs in a worker process, so it opens its own reader
+    with open(pdf_path, "rb") as pdf_file:
+        return _extract_pages(PyPDF2.PdfReader(pdf_file), start, stop)
 
 
 class PDFProcessor:
     def __init__(self):
-        pass
+        self.page_errors = []
+        self.num_pages = 0
+
+    def extract_text_from_pdf(self, pdf_path, parallel=None):
+        return list(self.iter_pages(pdf_path, parallel=parallel))
 
-    def extract_text_from_pdf(self, pdf_path):
+    def iter_pages(self, pdf_path, parallel=None):
+        """Yield ``{"page_number", "text"}`` dicts in page order.
+
+        Only a bounded number of pages is held in memory at a time, in both the
+        sequential and the parallel mode.
+        """
+        self.page_errors = []
         try:
             with open(pdf_path, "rb") as pdf_file:
                 pdf_reader = PyPDF2.PdfReader(pdf_file)
-                page_texts = []
-                for page_num, page in enumerate(pdf_reader.pages):
-                    text = page.extract_text()
-                    if text:
-                        page_texts.append({"page_number": page_num + 1, "text": text})
-            return page_texts
+                self.num_pages = len(pdf_reader.pages)
+                if parallel is None:
+                    parallel = (
+                        Config.EXTRACT_WORKERS > 1
+                        and self.num_pages >= Config.PARALLEL_EXTRACT_MIN_PAGES
+                    )
+                if parallel:
+                    yield from self._iter_pages_parallel(pdf_path, pdf_reader)
+                else:
+                    for page_num in range(self.num_pages):
+                        page_texts, page_errors = _extract_pages(
+                            pdf_reader, page_num, page_num + 1
+                        )
+                        self.page_errors.extend(page_errors)
+                        yield from page_texts
         except Exception as e:
             logger.error(f"Error extracting text from PDF: {e}")
             raise e
 
+        if self.page_errors:
+            failed = [error["page_number"] for error in self.page_errors]
+            logger.warning(f"Failed to extract text from pages {failed} of {pdf_path}")
+
+    def _iter_pages_parallel(self, pdf_path, pdf_reader):
+        # Several ranges per worker so one slow range doesn't leave the others
+        # idle, capped so a single range never holds too many pages in memory
+        num_ranges = Config.EXTRACT_WORKERS * 4
+        range_size = max(
+            1, min(MAX_PAGES_PER_RANGE, -(-self.num_pages // num_ranges))
+        )
+        ranges = iter(
+            [
+                (start, min(start + range_size, self.num_pages))
+                for start in range(0, self.num_pages, range_size)
+            ]
+        )
+
+        def submit(page_range):
+            try:
+                future = _get_process_pool().submit(
+                    _extract_page_range, str(pdf_path), *page_range
+                )
+            except BrokenProcessPool:
+                _reset_process_pool()
+                future = None
+            return page_range, future
+
+        in_flight = deque(
+            submit(page_range)
+            for page_range in itertools.islice(ranges, Config.EXTRACT_WORKERS * 2)
+        )
+        while in_flight:
+            (start, stop), future = in_flight.popleft()
+            next_range = next(ranges, None)
+            if next_range is not None:
+                in_flight.append(submit(next_range))
+            try:
+                if future is None:
+                    raise BrokenProcessPool("process pool was reset")
+                page_texts, page_errors = future.result()
+            except Exception as e:
+                # A worker died or could not read the file; redo this range here
+                logger.warning(f"Parallel extraction of pages {start + 1}-{stop} failed: {e}")
+                if isinstance(e, BrokenProcessPool):
+                    _reset_process_pool()
+                page_texts, page_errors = _extract_pages(pdf_reader, start, stop)
+            self.page_errors.extend(page_errors)
+            yield from page_texts
+
     def tokenize_text(self, page_texts, max_tokens=Config.MAX_TOKENS):
-        chunks = []
+        return list(self.iter_chunks(page_texts, max_tokens=max_tokens))
+
+    def iter_chunks(self, page_texts, max_tokens=Config.MAX_TOKENS):
+        if Config.CHUNKER == "nltk":
+            return self.iter_nltk_chunks(page_texts, max_tokens=max_tokens)
+        return OffsetChunker(max_tokens=max_tokens).iter_chunks(page_texts)
+
+    def iter_nltk_chunks(self, page_texts, max_tokens=Config.MAX_TOKENS):
+        # Legacy chunker: per-page word_tokenize, tokens re-joined with spaces
+        nltk = _load_nltk()
         chunk_id = 0
         for page in page_texts:
             tokens = nltk.word_tokenize(page["text"])
             for i in range(0, len(tokens), max_tokens):
                 chunk_tokens = tokens[i : i + max_tokens]
                 chunk_text = " ".join(chunk_tokens)
-                chunks.append(
-                    {
-                        "chunk_id": f"chunk_{chunk_id}",
-                        "text": chunk_text,
-                        "page_number": page["page_number"],
-                    }
-                )
+                yield {
+                    "chunk_id": f"chunk_{chunk_id}",
+                    "text": chunk_text,
+                    "page_number": page["page_number"],
+                }
                 chunk_id += 1
-        return chunks
 
     def get_full_text(self, page_text: dict) -> str:
-        full_text = ""
-        for page in page_text:
-            full_text += page["text"] + " "
-        return full_text
+        return " ".join(page["text"] for page in page_text)
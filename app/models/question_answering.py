@@ -1,58 +1,381 @@
 # app/models/question_answering.py
 
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.models.answer_cache import answer_cache
 from app.utils.config import Config
 from app.utils.logger import get_logger
-from anthropic import Anthropic
+from app.utils.resources import resources
 
 
 logger = get_logger(__name__)
 
+CHARS_PER_TOKEN = 4  # rough estimate used to size prompts
+BATCH_ANSWER_TOOL = "record_answers"
+
+
+async def _gather_or_cancel(aws):
+    # Like asyncio.gather, but the first failure cancels the rest
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    if not tasks:
+        return []
+    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    for task in done:
+        if task.exception() is not None:
+            for other in pending:
+                other.cancel()
+            raise task.exception()
+    return [task.result() for task in tasks]
+
 
 class QuestionAnswering:
-    def __init__(self):
+    def __init__(self, registry=resources):
         self.api_key = Config.ANTHROPIC_API_KEY
         self.answer_model = Config.ANSWER_MODEL
         self.summary_model = Config.SUMMARY_MODEL
-        self.client = Anthropic(api_key=Config.ANTHROPIC_API_KEY)
+        self.registry = registry
+
+    @property
+    def llm(self):
+        # Rate-limited, retried and coalesced Anthropic calls
+        return self.registry.llm
+
+    def _answer_system(self, context):
+        # The context goes in the system prompt, ahead of the questions, so
+        # calls that share it (single or batched) share a cacheable prefix
+        context_block = {
+            "type": "text",
+            "text": f"Context:\n\"\"\"\n{context}\n\"\"\"",
+        }
+        if self._cacheable(context):
+            context_block["cache_control"] = {"type": "ephemeral"}
+        return [
+            {
+                "type": "text",
+                "text": (
+                    "You are an AI assistant that answers questions based solely on the provided context.\n"
+                    'If the answer is not in the context, reply "Data Not Available".'
+                ),
+            },
+            context_block,
+        ]
+
+    def _answer_request(self, context, question):
+        return {
+            "max_tokens": 512,
+            "model": self.answer_model,
+            "system": self._answer_system(context),
+            "messages": [{"role": "user", "content": f"Question:\n{question}"}],
+        }
+
+    def _batch_answer_request(self, context, questions):
+        # A forced tool call makes the model return one string per question
+        # as structured input instead of free text
+        keys = [f"q{number}" for number in range(1, len(questions) + 1)]
+        numbered = "\n".join(
+            f"{key}: {question}" for key, question in zip(keys, questions)
+        )
+        return {
+            "max_tokens": min(512 * len(questions), 4096),
+            "model": self.answer_model,
+            "system": self._answer_system(context),
+            "messages": [
+                {
+                    "role": "user",
+                    "content": (
+                        "Answer each of the following questions independently, "
+                        f"and record the answers with the {BATCH_ANSWER_TOOL} tool.\n\n"
+                        f"Questions:\n{numbered}"
+                    ),
+                }
+            ],
+            "tools": [
+                {
+                    "name": BATCH_ANSWER_TOOL,
+                    "description": "Record the answer to every question, keyed by question id.",
+                    "input_schema": {
+                        "type": "object",
+                        "properties": {key: {"type": "string"} for key in keys},
+                        "required": keys,
+                    },
+                }
+            ],
+            "tool_choice": {"type": "tool", "name": BATCH_ANSWER_TOOL},
+        }
+
+    def _cacheable(self, context):
+        # Anthropic ignores cache_control below a model-dependent minimum
+        return (
+            Config.PROMPT_CACHE_ENABLED
+            and len(context) >= Config.PROMPT_CACHE_MIN_TOKENS * CHARS_PER_TOKEN
+        )
+
+    def _cached_answer(self, pdf_id, context, question):
+        if pdf_id is None or not Config.ANSWER_CACHE_ENABLED:
+            return None
+        return answer_cache.get(pdf_id, question, context, self.answer_model)
 
-    def get_answer(self, context, question):
-        prompt = f"""
-            You are an AI assistant that answers questions based solely on the provided context.
-            If the answer is not in the context, reply "Data Not Available".
+    def _store_answer(self, pdf_id, context, question, answer):
+        if pdf_id is not None and Config.ANSWER_CACHE_ENABLED:
+            answer_cache.put(pdf_id, question, context, self.answer_model, answer)
 
-            Context:
-            \"\"\"
-            {context}
-            \"\"\"
+    # The answer cache reads and writes SQLite, so the async paths run it on
+    # a worker thread instead of blocking the event loop
 
-            Question:
-            {question}
+    async def _acached_answer(self, pdf_id, context, question):
+        if pdf_id is None or not Config.ANSWER_CACHE_ENABLED:
+            return None
+        return await asyncio.to_thread(self._cached_answer, pdf_id, context, question)
 
-            Answer:"""
-        # logger.info(f"Prompt to the system is {prompt}")
+    async def _astore_answer(self, pdf_id, context, question, answer):
+        if pdf_id is not None and Config.ANSWER_CACHE_ENABLED:
+            await asyncio.to_thread(self._store_answer, pdf_id, context, question, answer)
+
+    def get_answer(self, context, question, pdf_id=None):
+        cached = self._cached_answer(pdf_id, context, question)
+        if cached is not None:
+            return cached
+        request = self._answer_request(context, question)
 
         try:
-            response = self.client.messages.create(
-                max_tokens=512,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt,
-                    }
-                ],
-                model=self.answer_model,
-            )
+            response = self.llm.create("answer", **request)
+            answer = response.content[0].text
+            self._store_answer(pdf_id, context, question, answer)
+            return answer
+        except Exception as e:
+            logger.error(f"Error getting answer from LLM : {e}")
+            raise e
+
+    async def aget_answer(self, context, question, pdf_id=None):
+        cached = await self._acached_answer(pdf_id, context, question)
+        if cached is not None:
+            return cached
+        return await self._aget_uncached_answer(context, question, pdf_id)
+
+    async def _aget_uncached_answer(self, context, question, pdf_id):
+        request = self._answer_request(context, question)
+
+        try:
+            response = await self.llm.acreate("answer", **request)
+            answer = response.content[0].text
+            await self._astore_answer(pdf_id, context, question, answer)
+            return answer
+        except Exception as e:
+            logger.error(f"Error getting answer from LLM : {e}")
+            raise e
+
+    async def aget_answers(
+        self, items, pdf_id=None, concurrency=None, timeout=None, pdf_ids=None
+    ):
+        """Answer ``(context, question)`` pairs concurrently.
+
+        At most ``concurrency`` calls are in flight and each one is cancelled
+        after ``timeout`` seconds. Answers are returned in the order of
+        ``items``; if any call fails, the others are cancelled and the error
+        is raised. Cached answers for ``pdf_id`` skip the queue. ``pdf_ids``
+        gives each item its own pdf_id instead, for routed questions.
+        """
+        semaphore = asyncio.Semaphore(concurrency or Config.ANSWER_CONCURRENCY)
+        timeout = timeout or Config.ANSWER_TIMEOUT_SECONDS
+        pdf_ids = pdf_ids or [pdf_id] * len(items)
+
+        async def answer(context, question, pdf_id):
+            cached = await self._acached_answer(pdf_id, context, question)
+            if cached is not None:
+                return cached
+            async with semaphore:
+                return await asyncio.wait_for(
+                    self._aget_uncached_answer(context, question, pdf_id), timeout=timeout
+                )
+
+        first = None
+        if Config.PROMPT_CACHE_PRIME and self._shares_cacheable_context(items):
+            # Answer one question first so the others read its prompt cache
+            # entry instead of all writing their own
+            first = await answer(*items[0], pdf_ids[0])
+            items, pdf_ids = items[1:], pdf_ids[1:]
+
+        answers = await _gather_or_cancel(
+            answer(context, question, pdf_id)
+            for (context, question), pdf_id in zip(items, pdf_ids)
+        )
+        return answers if first is None else [first] + answers
+
+    async def astream_answers(
+        self, items, pdf_id=None, concurrency=None, timeout=None, pdf_ids=None
+    ):
+        """Answer ``(context, question)`` pairs concurrently, yielding events.
+
+        Each event is a dict with the ``index`` of its item:
+        ``{"event": "delta", "text": ...}`` for every piece of text streamed
+        by Anthropic, then ``{"event": "answer", "answer": ...}`` when the
+        answer is complete, or ``{"event": "error"}`` if it failed or timed
+        out. Answers arrive in completion order, and a failure doesn't stop
+        the other questions. Cached answers are yielded first, without
+        deltas. Closing the generator cancels the calls still in flight.
+        ``pdf_ids`` is as in ``aget_answers``.
+        """
+        semaphore = asyncio.Semaphore(concurrency or Config.ANSWER_CONCURRENCY)
+        timeout = timeout or Config.ANSWER_TIMEOUT_SECONDS
+        pdf_ids = pdf_ids or [pdf_id] * len(items)
+        events = asyncio.Queue()
+
+        async def answer(index, context, question, pdf_id):
+            def on_delta(text):
+                events.put_nowait({"event": "delta", "index": index, "text": text})
+
+            try:
+                result = await self._acached_answer(pdf_id, context, question)
+                if result is None:
+                    async with semaphore:
+                        result = await asyncio.wait_for(
+                            self._astream_uncached_answer(
+                                context, question, pdf_id, on_delta
+                            ),
+                            timeout=timeout,
+                        )
+                events.put_nowait({"event": "answer", "index": index, "answer": result})
+            except asyncio.TimeoutError:
+                logger.error(f"Timed out streaming answer to question {index}")
+                events.put_nowait({"event": "error", "index": index})
+            except Exception:
+                # Already logged by _astream_uncached_answer
+                events.put_nowait({"event": "error", "index": index})
+
+        tasks = [
+            asyncio.ensure_future(answer(index, context, question, pdf_id))
+            for index, ((context, question), pdf_id) in enumerate(zip(items, pdf_ids))
+        ]
+        try:
+            remaining = len(tasks)
+            while remaining:
+                event = await events.get()
+                if event["event"] != "delta":
+                    remaining -= 1
+                yield event
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _astream_uncached_answer(self, context, question, pdf_id, on_delta):
+        request = self._answer_request(context, question)
+
+        try:
+            response = await self.llm.astream("answer", on_delta, **request)
             answer = response.content[0].text
+            await self._astore_answer(pdf_id, context, question, answer)
             return answer
         except Exception as e:
             logger.error(f"Error getting answer from LLM : {e}")
             raise e
 
+    async def aget_batch_answers(
+        self, groups, pdf_id=None, concurrency=None, timeout=None, pdf_ids=None
+    ):
+        """Answer ``(context, questions)`` groups with one call per group.
+
+        Returns ``{question: answer}``. Cached answers are used as in
+        ``aget_answers``; a group left with one uncached question, or any
+        question missing from the model's structured reply, is answered
+        with a regular per-question call. ``pdf_ids`` has one pdf_id per
+        group.
+        """
+        semaphore = asyncio.Semaphore(concurrency or Config.ANSWER_CONCURRENCY)
+        timeout = timeout or Config.ANSWER_TIMEOUT_SECONDS
+        pdf_ids = pdf_ids or [pdf_id] * len(groups)
+
+        async def answer_group(context, questions, pdf_id):
+            answers = {}
+            uncached = []
+            for question in dict.fromkeys(questions):
+                cached = await self._acached_answer(pdf_id, context, question)
+                if cached is not None:
+                    answers[question] = cached
+                else:
+                    uncached.append(question)
+            if len(uncached) > 1:
+                async with semaphore:
+                    batch = await asyncio.wait_for(
+                        self._aget_batch_answer(context, uncached), timeout=timeout
+                    )
+                for question, answer in batch.items():
+                    await self._astore_answer(pdf_id, context, question, answer)
+                answers.update(batch)
+                uncached = [question for question in uncached if question not in batch]
+                if uncached:
+                    logger.warning(
+                        f"Batched answer missed {len(uncached)} questions, asking them one by one"
+                    )
+            retried = await self.aget_answers(
+                [(context, question) for question in uncached],
+                pdf_id=pdf_id,
+                concurrency=concurrency,
+                timeout=timeout,
+            )
+            answers.update(zip(uncached, retried))
+            return answers
+
+        answers = {}
+        for group_answers in await _gather_or_cancel(
+            answer_group(context, questions, pdf_id)
+            for (context, questions), pdf_id in zip(groups, pdf_ids)
+        ):
+            answers.update(group_answers)
+        return answers
+
+    async def _aget_batch_answer(self, context, questions):
+        request = self._batch_answer_request(context, questions)
+
+        try:
+            response = await self.llm.acreate("batch_answer", **request)
+        except Exception as e:
+            logger.error(f"Error getting answer from LLM : {e}")
+            raise e
+
+        recorded = next(
+            (
+                block.input
+                for block in response.content
+                if block.type == "tool_use" and block.name == BATCH_ANSWER_TOOL
+            ),
+            {},
+        )
+        return {
+            question: recorded[f"q{number}"]
+            for number, question in enumerate(questions, start=1)
+            if isinstance(recorded.get(f"q{number}"), str)
+        }
+
+    def _shares_cacheable_context(self, items):
+        contexts = {context for context, _ in items}
+        return len(items) > 1 and len(contexts) == 1 and self._cacheable(contexts.pop())
+
     def get_summary(self, text):
         prompt = f"Summarize the following text:\n\n{text}\n\nSummary:"
+        return self._summarize(prompt)
 
+    def get_section_summary(self, text, section_number):
+        prompt = (
+            f"The following text is section {section_number} of a longer document. "
+            f"Summarize it, keeping the key facts, names and figures.\n\n{text}\n\nSummary:"
+        )
+        return self._summarize(prompt)
+
+    def combine_summaries(self, summaries):
+        sections = "\n\n".join(
+            f"Section {i}:\n{summary}" for i, summary in enumerate(summaries, start=1)
+        )
+        prompt = (
+            "The following are summaries of consecutive sections of one document. "
+            f"Combine them into a single summary of the whole document.\n\n{sections}\n\nSummary:"
+        )
+        return self._summarize(prompt)
+
+    def _summarize(self, prompt):
         try:
-            response = self.client.messages.create(
+            response = self.llm.create(
+                "summary",
                 max_tokens=512,
                 messages=[
                     {
@@ -67,3 +390,92 @@ class QuestionAnswering:
         except Exception as e:
             logger.error(f"Error getting answer from LLM : {e}")
             raise e
+
+
+class SectionSummarizer:
+    """Map-reduce summarizer for documents fed in page by page.
+
+    Text is cut into sections of about ``section_tokens`` tokens, which are
+    summarized on a pool of ``concurrency`` threads while the rest of the
+    document is still being read. ``finish`` then combines the partial
+    summaries, in groups if they don't fit in one section. A document that
+    fits in a single section gets a single ``get_summary`` call.
+    """
+
+    def __init__(self, question_answering, section_tokens=None, concurrency=None):
+        self.question_answering = question_answering
+        self.section_chars = (
+            section_tokens or Config.SUMMARY_SECTION_TOKENS
+        ) * CHARS_PER_TOKEN
+        self.concurrency = concurrency or Config.SUMMARY_CONCURRENCY
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="summary"
+        )
+        # Bounds the sections waiting for a worker, so a fast reader can't
+        # buffer the whole document in the executor queue
+        self._slots = threading.BoundedSemaphore(self.concurrency * 2)
+        self._buffer = []
+        self._buffer_chars = 0
+        self._futures = []
+
+    def add_text(self, text):
+        while text:
+            room = self.section_chars - self._buffer_chars
+            self._buffer.append(text[:room])
+            self._buffer_chars += len(text[:room])
+            text = text[room:]
+            if self._buffer_chars >= self.section_chars:
+                self._submit_section()
+
+    def finish(self):
+        try:
+            if not self._futures:
+                return self.question_answering.get_summary(" ".join(self._buffer))
+            if self._buffer:
+                self._submit_section()
+            summaries = [future.result() for future in self._futures]
+            logger.info(f"Summarized {len(summaries)} sections, combining")
+            return self._reduce(summaries)
+        finally:
+            self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit_section(self):
+        text = " ".join(self._buffer)
+        self._buffer = []
+        self._buffer_chars = 0
+        self._slots.acquire()
+        future = self._executor.submit(
+            self.question_answering.get_section_summary, text, len(self._futures) + 1
+        )
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def _reduce(self, summaries):
+        # Combine groups of partial summaries concurrently until one call can
+        # take all of them. Every pass merges at least one pair, so this ends
+        # even when single summaries are longer than a section.
+        while (
+            len(summaries) > 1
+            and sum(len(summary) for summary in summaries) > self.section_chars
+        ):
+            groups = []
+            for summary in summaries:
+                if groups and sum(len(s) for s in groups[-1]) + len(summary) <= self.section_chars:
+                    groups[-1].append(summary)
+                else:
+                    groups.append([summary])
+            if len(groups) == len(summaries):
+                # Every summary fills a section on its own; combine pairwise
+                groups = [summaries[i : i + 2] for i in range(0, len(summaries), 2)]
+            summaries = list(self._executor.map(self._combine, groups))
+        return self._combine(summaries)
+
+    def _combine(self, summaries):
+        # A lone summary has nothing to be combined with, so it is passed on
+        # as it is instead of paying for a rewrite
+        if len(summaries) == 1:
+            return summaries[0]
+        return self.question_answering.combine_summaries(summaries)
@@ -0,0 +1,186 @@
+# app/models/semantic_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+from app.models.answer_cache import normalize_question
+from app.models.catalog import catalog
+from app.utils.config import Config
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class _PDFEntries:
+    # Normalized question embeddings of one PDF as rows of a matrix; rows
+    # beyond ``size`` are spare capacity
+    def __init__(self, version):
+        self.version = version
+        self.matrix = None
+        self.size = 0
+        self.questions = []
+        self.answers = []
+        self.positions = {}
+
+
+class SemanticCache:
+    """Answers to earlier questions, found by embedding similarity.
+
+    A question whose embedding has a cosine similarity of at least
+    ``threshold`` with one already answered for the same pdf_id gets that
+    answer back, so paraphrases skip retrieval and the LLM call. Entries are
+    kept in memory, at most ``max_entries`` over all PDFs, and the least
+    recently used are evicted first. The PDF's catalog row is checked on
+    every lookup, so answers do not outlive a replaced or purged PDF in any
+    worker process.
+    """
+
+    def __init__(self, threshold, max_entries):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._pdfs = {}
+        self._lru = OrderedDict()  # (pdf_id, question) -> None, oldest first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lookup_seconds = 0.0
+        self._answer_seconds = 0.0
+        self._answered = 0
+
+    def lookup(self, pdf_id, questions, embeddings):
+        """Return the cached answer for each question, or None."""
+        import numpy as np
+
+        start = time.perf_counter()
+        answers = [None] * len(questions)
+        version = _version(pdf_id)
+        with self._lock:
+            entries = self._pdfs.get(pdf_id)
+            if entries is not None and entries.version != version:
+                self._drop(pdf_id)
+                entries = None
+            if entries is not None and entries.size:
+                queries = _normalize(np.asarray(embeddings, dtype=np.float32))
+                scores = entries.matrix[: entries.size] @ queries.T
+                best = np.argmax(scores, axis=0)
+                for index, row in enumerate(best):
+                    if scores[row, index] >= self.threshold:
+                        answers[index] = entries.answers[row]
+                        self._lru.move_to_end((pdf_id, entries.questions[row]))
+            hits = sum(answer is not None for answer in answers)
+            self.hits += hits
+            self.misses += len(questions) - hits
+            self._lookup_seconds += time.perf_counter() - start
+        return answers
+
+    def put(self, pdf_id, question, embedding, answer):
+        import numpy as np
+
+        key = normalize_question(question)
+        version = _version(pdf_id)
+        if version is None:
+            return  # purged while the question was being answered
+        vector = _normalize(np.asarray(embedding, dtype=np.float32))
+        with self._lock:
+            entries = self._pdfs.get(pdf_id)
+            if entries is None or entries.version != version:
+                self._drop(pdf_id)
+                entries = self._pdfs[pdf_id] = _PDFEntries(version)
+            position = entries.positions.get(key)
+            if position is None:
+                if entries.matrix is None or entries.size == len(entries.matrix):
+                    grown = np.empty((max(2 * entries.size, 16), len(vector)), np.float32)
+                    if entries.size:
+                        grown[: entries.size] = entries.matrix[: entries.size]
+                    entries.matrix = grown
+                position = entries.size
+                entries.size += 1
+                entries.questions.append(key)
+                entries.answers.append(answer)
+                entries.positions[key] = position
+            entries.matrix[position] = vector
+            entries.answers[position] = answer
+            self._lru[(pdf_id, key)] = None
+            self._lru.move_to_end((pdf_id, key))
+            while len(self._lru) > self.max_entries:
+                old_pdf_id, old_key = self._lru.popitem(last=False)[0]
+                self._remove(old_pdf_id, old_key)
+                self.evictions += 1
+
+    def record_answer_time(self, questions, seconds):
+        # Time taken to answer questions the cache missed (retrieval plus
+        # the LLM), from which the time saved by hits is estimated
+        with self._lock:
+            self._answered += questions
+            self._answer_seconds += seconds
+
+    def invalidate(self, pdf_id):
+        with self._lock:
+            dropped = self._drop(pdf_id)
+        if dropped:
+            logger.info(f"Dropped {dropped} semantically cached answers for {pdf_id}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            lookup_ms = self._lookup_seconds / lookups * 1000 if lookups else 0.0
+            answer_ms = self._answer_seconds / self._answered * 1000 if self._answered else 0.0
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._lru),
+                "pdfs": len(self._pdfs),
+                "evictions": self.evictions,
+                "threshold": self.threshold,
+                "mean_lookup_ms": lookup_ms,
+                "mean_answer_ms": answer_ms,
+                "estimated_seconds_saved": self.hits * max(answer_ms - lookup_ms, 0.0) / 1000,
+            }
+
+    def _drop(self, pdf_id):
+        entries = self._pdfs.pop(pdf_id, None)
+        if entries is None:
+            return 0
+        for key in entries.questions:
+            self._lru.pop((pdf_id, key), None)
+        return entries.size
+
+    def _remove(self, pdf_id, key):
+        entries = self._pdfs[pdf_id]
+        position = entries.positions.pop(key)
+        # Move the last row into the hole
+        last = entries.size - 1
+        if position != last:
+            entries.matrix[position] = entries.matrix[last]
+            entries.questions[position] = entries.questions[last]
+            entries.answers[position] = entries.answers[last]
+            entries.positions[entries.questions[position]] = position
+        entries.questions.pop()
+        entries.answers.pop()
+        entries.size -= 1
+        if not entries.size:
+            del self._pdfs[pdf_id]
+
+
+def _version(pdf_id):
+    # Changes when the PDF is replaced (new content hash) or purged and
+    # ingested again (new creation time); None once it is purged
+    existing = catalog.get(pdf_id)
+    if existing is None:
+        return None
+    return existing["content_hash"], existing["created_at"]
+
+
+def _normalize(vectors):
+    import numpy as np
+
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+semantic_cache = SemanticCache(
+    threshold=Config.SEMANTIC_CACHE_THRESHOLD,
+    max_entries=Config.SEMANTIC_CACHE_MAX_ENTRIES,
+)
@@ -0,0 +1,136 @@
+# app/models/summary_router.py
+
+import threading
+from app.models.catalog import catalog
+from app.utils.logger import get_logger
+from app.utils.resources import resources, SUMMARY_COLLECTION
+
+logger = get_logger(__name__)
+
+LOAD_BATCH_SIZE = 1000
+
+
+class SummaryRouter:
+    """Routes questions to PDFs using an in-memory matrix of summary embeddings.
+
+    The embeddings of ``pdf_summaries`` are held as one normalized float32
+    matrix, so routing a batch of questions is a single matrix product
+    instead of a Chroma query per request. The matrix is loaded on first
+    use and updated in place when this process adds or deletes a summary.
+    Other processes bump a version number in the catalog, and a stale
+    matrix is reloaded before the next route.
+    """
+
+    def __init__(self, registry=resources):
+        self.registry = registry
+        self._lock = threading.Lock()
+        self._matrix = None  # rows beyond _size are spare capacity
+        self._size = 0
+        self._ids = []
+        self._positions = {}
+        self._version = None
+
+    def route(self, query_embeddings, top_k=1):
+        """Return the ``top_k`` best matching pdf_ids for every question."""
+        import numpy as np
+
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32))
+        with self._lock:
+            self._sync()
+            if not self._size:
+                return [[] for _ in range(len(queries))]
+            top_k = min(top_k, self._size)
+            scores = self._matrix[: self._size] @ queries.T
+            if top_k == 1:
+                best = np.argmax(scores, axis=0)[np.newaxis, :]
+            else:
+                best = np.argpartition(-scores, top_k - 1, axis=0)[:top_k]
+                order = np.argsort(-np.take_along_axis(scores, best, axis=0), axis=0)
+                best = np.take_along_axis(best, order, axis=0)
+            return [[self._ids[row] for row in column] for column in best.T]
+
+    def add(self, pdf_id, embedding):
+        import numpy as np
+
+        with self._lock:
+            if self._matrix is None:
+                # Not loaded yet; the first route reads the new summary too
+                self._bump()
+                return
+            vector = _normalize(np.asarray(embedding, dtype=np.float32))
+            position = self._positions.get(pdf_id)
+            if position is None:
+                if self._size == len(self._matrix):
+                    grown = np.empty(
+                        (max(2 * self._size, 64), len(vector)), dtype=np.float32
+                    )
+                    if self._size:
+                        grown[: self._size] = self._matrix[: self._size]
+                    self._matrix = grown
+                position = self._size
+                self._size += 1
+                self._ids.append(pdf_id)
+                self._positions[pdf_id] = position
+            self._matrix[position] = vector
+            self._bump()
+
+    def remove(self, pdf_id):
+        with self._lock:
+            if self._matrix is None:
+                self._bump()
+                return
+            position = self._positions.pop(pdf_id, None)
+            if position is not None:
+                # Move the last row into the hole
+                last = self._size - 1
+                if position != last:
+                    self._matrix[position] = self._matrix[last]
+                    self._ids[position] = self._ids[last]
+                    self._positions[self._ids[position]] = position
+                self._ids.pop()
+                self._size -= 1
+            self._bump()
+
+    def _bump(self):
+        version = catalog.bump_summaries_version()
+        # Still current only if no other process changed the summaries since
+        # the last sync
+        current = self._version is not None and version == self._version + 1
+        self._version = version if current else None
+
+    def _sync(self):
+        version = catalog.summaries_version()
+        if self._matrix is not None and version == self._version:
+            return
+        self._load()
+        self._version = version
+
+    def _load(self):
+        import numpy as np
+
+        summaries = self.registry.get_collection(SUMMARY_COLLECTION)
+        ids, rows = [], []
+        while True:
+            batch = summaries.get(
+                limit=LOAD_BATCH_SIZE, offset=len(ids), include=["embeddings"]
+            )
+            if not len(batch["ids"]):
+                break
+            ids.extend(batch["ids"])
+            rows.append(np.asarray(batch["embeddings"], dtype=np.float32))
+        matrix = _normalize(np.concatenate(rows)) if rows else np.empty((0, 0), np.float32)
+        self._matrix = np.ascontiguousarray(matrix)
+        self._size = len(ids)
+        self._ids = ids
+        self._positions = {pdf_id: position for position, pdf_id in enumerate(ids)}
+        logger.info(f"Loaded {len(ids)} summary embeddings for routing")
+
+
+def _normalize(vectors):
+    import numpy as np
+
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+summary_router = SummaryRouter()
@@ -0,0 +1,547 @@
+# app/models/vector_store.py
+
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class VectorStore:
+    """Where chunk and summary vectors are kept (``VECTOR_STORE``).
+
+    A store hands out named collections. A collection supports the subset
+    of the Chroma collection API that the app uses, so a Chroma collection
+    is one as it is:
+
+    - ``add`` / ``upsert`` / ``update(ids, embeddings, documents, metadatas)``
+    - ``delete(ids=None, where=None)``
+    - ``get(ids=None, where=None, limit=None, offset=None, include=...)``
+    - ``query(query_embeddings, n_results, where=None, include=...)``
+    - ``count()``, ``name``, ``metadata`` and ``modify(metadata=...)``
+
+    Results are shaped like Chroma's. ``where`` filters are equality on
+    metadata fields. Embeddings are always passed in precomputed.
+    """
+
+    def get_collection(self, name):
+        raise NotImplementedError
+
+    def delete_collection(self, name):
+        raise NotImplementedError
+
+    def list_collections(self):
+        """Names of all collections."""
+        raise NotImplementedError
+
+    def release(self, collection):
+        """Free the files a collection handle holds open.
+
+        The handle stays usable and reopens them if it is used again.
+        """
+
+
+class ChromaVectorStore(VectorStore):
+    def __init__(self, client, embedding_function):
+        self.client = client
+        self.embedding_function = embedding_function
+
+    def get_collection(self, name):
+        return self.client.get_or_create_collection(
+            name=name, embedding_function=self.embedding_function
+        )
+
+    def delete_collection(self, name):
+        self.client.delete_collection(name=name)
+
+    def list_collections(self):
+        return [collection.name for collection in self.client.list_collections()]
+
+
+class MemmapVectorStore(VectorStore):
+    """Quantized vectors in memory-mapped files, searched exactly.
+
+    Each collection is a directory holding its vectors as ``int8`` (with a
+    float32 scale per row) or ``float16``, plus a SQLite file with the ids,
+    documents and metadata. The vector files are mapped read-only, so every
+    worker process shares one copy through the page cache instead of each
+    loading its own index. Queries compute the cosine similarity with every
+    candidate row (all rows, or those matching ``where``) in blocks. Vectors
+    are normalized when stored, and distances are squared L2 like Chroma's
+    default (``2 - 2 * cosine``).
+    """
+
+    def __init__(self, path, dtype="int8"):
+        if dtype not in MemmapCollection.DTYPES:
+            raise ValueError(f"Unsupported MEMMAP_DTYPE {dtype!r}, use int8 or float16")
+        self.path = path
+        self.dtype = dtype
+        os.makedirs(path, exist_ok=True)
+
+    def get_collection(self, name):
+        return MemmapCollection(os.path.join(self.path, name), name, self.dtype)
+
+    def delete_collection(self, name):
+        directory = os.path.join(self.path, name)
+        if not os.path.isdir(directory):
+            raise ValueError(f"Collection {name} does not exist")
+        shutil.rmtree(directory)
+
+    def list_collections(self):
+        return sorted(
+            name
+            for name in os.listdir(self.path)
+            if os.path.isfile(os.path.join(self.path, name, MemmapCollection.DB_NAME))
+        )
+
+    def release(self, collection):
+        collection.close()
+
+
+class MemmapCollection:
+    DB_NAME = "rows.sqlite3"
+    DTYPES = ("int8", "float16")
+    # Rows dequantized at once while scoring; small enough to stay in cache
+    QUERY_BLOCK_ROWS = 4096
+    # Rewrite the vector files once deleted rows outnumber live ones
+    COMPACT_MIN_DEAD_ROWS = 1024
+
+    def __init__(self, path, name, dtype):
+        self.path = path
+        self.name = name
+        self._lock = threading.RLock()
+        self._connection = None
+        self._created_dtype = dtype
+        self._mapped = None  # (generation, rows, vectors, scales)
+        # The dtype a collection was created with wins over the setting
+        self.dtype = self._meta("dtype")
+
+    @property
+    def _db(self):
+        with self._lock:
+            if self._connection is None:
+                self._connection = self._connect()
+            return self._connection
+
+    def close(self):
+        # Closes the SQLite connection and unmaps the vector files; both are
+        # opened again if the collection is used after all
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+            self._mapped = None
+
+    def _connect(self):
+        os.makedirs(self.path, exist_ok=True)
+        db = sqlite3.connect(
+            os.path.join(self.path, self.DB_NAME), check_same_thread=False, timeout=30
+        )
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS rows ("
+            "id TEXT PRIMARY KEY, position INTEGER NOT NULL UNIQUE, "
+            "document TEXT, metadata TEXT)"
+        )
+        # Both layouts filter on pdf_id, so that lookup is indexed
+        db.execute(
+            "CREATE INDEX IF NOT EXISTS rows_pdf_id "
+            "ON rows (json_extract(metadata, '$.pdf_id'))"
+        )
+        db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        db.execute("INSERT OR IGNORE INTO meta VALUES ('dtype', ?)", (self._created_dtype,))
+        db.execute("INSERT OR IGNORE INTO meta VALUES ('generation', '0')")
+        db.execute("INSERT OR IGNORE INTO meta VALUES ('rows', '0')")
+        db.commit()
+        return db
+
+    # -- metadata of the collection itself
+
+    @property
+    def metadata(self):
+        value = self._meta("collection_metadata")
+        return json.loads(value) if value else None
+
+    def modify(self, metadata=None):
+        # Replaces the metadata, like Chroma's modify
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('collection_metadata', ?)",
+                (json.dumps(metadata),),
+            )
+            self._db.commit()
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    # -- writes
+
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        self._write(ids, embeddings, documents, metadatas, replace=False)
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        self._write(ids, embeddings, documents, metadatas, replace=True)
+
+    def update(self, ids, embeddings=None, documents=None, metadatas=None):
+        with self._lock:
+            self._begin_write()
+            try:
+                positions = self._positions_of(ids)
+                missing = [chunk_id for chunk_id, position in zip(ids, positions) if position is None]
+                if missing:
+                    raise ValueError(f"Unknown ids: {missing[:5]}")
+                if embeddings is not None:
+                    self._write_vectors(positions, embeddings)
+                for i, chunk_id in enumerate(ids):
+                    if documents is not None:
+                        self._db.execute(
+                            "UPDATE rows SET document = ? WHERE id = ?", (documents[i], chunk_id)
+                        )
+                    if metadatas is not None:
+                        self._db.execute(
+                            "UPDATE rows SET metadata = ? WHERE id = ?",
+                            (json.dumps(metadatas[i]), chunk_id),
+                        )
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+
+    def delete(self, ids=None, where=None):
+        with self._lock:
+            self._begin_write()
+            try:
+                if ids is not None:
+                    self._db.executemany(
+                        "DELETE FROM rows WHERE id = ?", [(chunk_id,) for chunk_id in ids]
+                    )
+                elif where is not None:
+                    clause, params = _where_clause(where)
+                    self._db.execute(f"DELETE FROM rows WHERE {clause}", params)
+                else:
+                    raise ValueError("delete needs ids or where")
+                live = self._db.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+                dead = int(self._meta("rows")) - live
+                if dead >= max(self.COMPACT_MIN_DEAD_ROWS, live):
+                    self._compact()
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+
+    def _write(self, ids, embeddings, documents, metadatas, replace):
+        if len(ids) != len(embeddings):
+            raise ValueError("ids and embeddings differ in length")
+        with self._lock:
+            self._begin_write()
+            try:
+                existing = self._positions_of(ids)
+                if not replace and any(position is not None for position in existing):
+                    raise ValueError("Some ids already exist; use upsert")
+                rows = int(self._meta("rows"))
+                positions = []
+                for position in existing:
+                    if position is None:
+                        position = rows
+                        rows += 1
+                    positions.append(position)
+                self._write_vectors(positions, embeddings)
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO rows (id, position, document, metadata) "
+                    "VALUES (?, ?, ?, ?)",
+                    [
+                        (
+                            chunk_id,
+                            position,
+                            documents[i] if documents is not None else None,
+                            json.dumps(metadatas[i]) if metadatas is not None else None,
+                        )
+                        for i, (chunk_id, position) in enumerate(zip(ids, positions))
+                    ],
+                )
+                self._set_meta("rows", rows)
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+
+    def _write_vectors(self, positions, embeddings):
+        import numpy as np
+
+        generation = self._meta("generation")
+        vectors, scales = _quantize(np.asarray(embeddings, dtype=np.float32), self.dtype)
+        if "dim" not in self._all_meta():
+            self._set_meta("dim", vectors.shape[1])
+        elif vectors.shape[1] != int(self._meta("dim")):
+            raise ValueError(
+                f"Embedding dimension {vectors.shape[1]} does not match {self._meta('dim')}"
+            )
+        row_bytes = vectors.shape[1] * vectors.itemsize
+        vector_path, scale_path = self._files(generation)
+        with _open_for_write(vector_path) as vector_file:
+            for position, vector in zip(positions, vectors):
+                vector_file.seek(position * row_bytes)
+                vector_file.write(vector.tobytes())
+        if scales is not None:
+            with _open_for_write(scale_path) as scale_file:
+                for position, scale in zip(positions, scales):
+                    scale_file.seek(position * 4)
+                    scale_file.write(np.float32(scale).tobytes())
+
+    def _compact(self):
+        # Copy the live rows into new files, in position order, and switch
+        # generation. Runs inside the caller's write transaction.
+        import numpy as np
+
+        generation = int(self._meta("generation"))
+        rows = self._db.execute("SELECT id, position FROM rows ORDER BY position").fetchall()
+        _, vectors, scales = self._map(generation, int(self._meta("rows")))
+        old_positions = np.fromiter((position for _, position in rows), dtype=np.int64)
+        vector_path, scale_path = self._files(generation + 1)
+        vectors[old_positions].tofile(vector_path)
+        if scales is not None:
+            scales[old_positions].tofile(scale_path)
+        # Renumber in two steps so the UNIQUE constraint never sees a clash
+        self._db.execute("UPDATE rows SET position = -1 - position")
+        self._db.executemany(
+            "UPDATE rows SET position = ? WHERE id = ?",
+            [(new, chunk_id) for new, (chunk_id, _) in enumerate(rows)],
+        )
+        self._set_meta("generation", generation + 1)
+        self._set_meta("rows", len(rows))
+        self._mapped = None
+        logger.info(f"Compacted collection {self.name} to {len(rows)} rows")
+        # Other processes may still have the old files mapped; on POSIX the
+        # data stays readable until they remap
+        for path in self._files(generation):
+            if os.path.exists(path):
+                os.remove(path)
+
+    # -- reads
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("metadatas", "documents")):
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                query = "SELECT id, position, document, metadata FROM rows"
+                params = []
+                if ids is not None:
+                    query += f" WHERE id IN ({', '.join('?' * len(ids))})"
+                    params = list(ids)
+                elif where is not None:
+                    clause, params = _where_clause(where)
+                    query += f" WHERE {clause}"
+                query += " ORDER BY position"
+                if limit is not None or offset:
+                    query += " LIMIT ? OFFSET ?"
+                    params += [-1 if limit is None else limit, offset or 0]
+                rows = self._db.execute(query, params).fetchall()
+                result = {"ids": [row[0] for row in rows]}
+                if "embeddings" in include:
+                    result["embeddings"] = self._vectors_at([row[1] for row in rows])
+                if "documents" in include:
+                    result["documents"] = [row[2] for row in rows]
+                if "metadatas" in include:
+                    result["metadatas"] = [_load_metadata(row[3]) for row in rows]
+                return result
+            finally:
+                self._db.rollback()
+
+    def query(
+        self,
+        query_embeddings,
+        n_results=10,
+        where=None,
+        include=("metadatas", "documents", "distances"),
+    ):
+        import numpy as np
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                candidates = self._candidates(where)
+                scores = self._scores(candidates, queries)
+                k = min(n_results, len(candidates))
+                if k:
+                    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                    order = np.argsort(-np.take_along_axis(scores, best, axis=1), axis=1)
+                    best = np.take_along_axis(best, order, axis=1)
+                else:
+                    best = np.empty((len(queries), 0), dtype=np.int64)
+                results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+                for row_scores, columns in zip(scores, best):
+                    found = self._rows_at(candidates[columns].tolist())
+                    results["ids"].append([row[0] for row in found])
+                    results["documents"].append([row[1] for row in found])
+                    results["metadatas"].append([_load_metadata(row[2]) for row in found])
+                    # Squared L2 between unit vectors, Chroma's default scale
+                    results["distances"].append((2 - 2 * row_scores[columns]).tolist())
+                return {key: value for key, value in results.items() if key == "ids" or key in include}
+            finally:
+                self._db.rollback()
+
+    def _candidates(self, where):
+        # Sorted positions of the rows a query searches
+        import numpy as np
+
+        if where is None:
+            rows = int(self._meta("rows"))
+            if self._db.execute("SELECT COUNT(*) FROM rows").fetchone()[0] == rows:
+                return np.arange(rows)  # no deleted rows in the files
+            positions = self._db.execute("SELECT position FROM rows").fetchall()
+        else:
+            clause, params = _where_clause(where)
+            positions = self._db.execute(
+                f"SELECT position FROM rows WHERE {clause}", params
+            ).fetchall()
+        candidates = np.fromiter((row[0] for row in positions), dtype=np.int64)
+        candidates.sort()
+        return candidates
+
+    def _scores(self, positions, queries):
+        # Cosine similarity of every query with the rows at ``positions``,
+        # dequantizing one block of rows at a time
+        import numpy as np
+
+        scores = np.empty((len(queries), len(positions)), dtype=np.float32)
+        if not len(positions):
+            return scores
+        _, vectors, scales = self._current_map()
+        contiguous = positions[-1] - positions[0] + 1 == len(positions)
+        for start in range(0, len(positions), self.QUERY_BLOCK_ROWS):
+            block = positions[start : start + self.QUERY_BLOCK_ROWS]
+            if contiguous:
+                rows = vectors[block[0] : block[-1] + 1]
+            else:
+                rows = vectors[block]
+            block_scores = queries @ rows.astype(np.float32).T
+            if scales is not None:
+                block_scores *= scales[block]
+            scores[:, start : start + len(block)] = block_scores
+        return scores
+
+    def _vectors_at(self, positions):
+        import numpy as np
+
+        if not positions:
+            return np.empty((0, int(self._meta("dim") or 0)), dtype=np.float32)
+        _, vectors, scales = self._current_map()
+        rows = vectors[positions].astype(np.float32)
+        if scales is not None:
+            rows *= scales[positions][:, np.newaxis]
+        return rows
+
+    def _rows_at(self, positions):
+        if not positions:
+            return []
+        found = {
+            row[0]: row[1:]
+            for row in self._db.execute(
+                "SELECT position, id, document, metadata FROM rows "
+                f"WHERE position IN ({', '.join('?' * len(positions))})",
+                positions,
+            )
+        }
+        return [found[position] for position in positions]
+
+    # -- files
+
+    def _files(self, generation):
+        extension = "i8" if self.dtype == "int8" else "f16"
+        return (
+            os.path.join(self.path, f"vectors.{generation}.{extension}"),
+            os.path.join(self.path, f"scales.{generation}.f32"),
+        )
+
+    def _current_map(self):
+        return self._map(int(self._meta("generation")), int(self._meta("rows")))
+
+    def _map(self, generation, rows):
+        # Maps the vector files read-only, remapping when they have grown or
+        # been compacted into a new generation
+        import numpy as np
+
+        if self._mapped is not None:
+            mapped_generation, mapped_rows, vectors, scales = self._mapped
+            if mapped_generation == generation and mapped_rows >= rows:
+                return generation, vectors, scales
+        dim = int(self._meta("dim"))
+        vector_path, scale_path = self._files(generation)
+        dtype = np.int8 if self.dtype == "int8" else np.float16
+        vectors = np.memmap(vector_path, dtype=dtype, mode="r", shape=(rows, dim))
+        scales = (
+            np.memmap(scale_path, dtype=np.float32, mode="r", shape=(rows,))
+            if self.dtype == "int8"
+            else None
+        )
+        self._mapped = (generation, rows, vectors, scales)
+        return generation, vectors, scales
+
+    # -- sqlite helpers
+
+    def _begin_write(self):
+        # Serializes writers across processes for the whole operation
+        self._db.execute("BEGIN IMMEDIATE")
+
+    def _positions_of(self, ids):
+        found = {}
+        for start in range(0, len(ids), 500):
+            batch = list(ids[start : start + 500])
+            found.update(
+                self._db.execute(
+                    f"SELECT id, position FROM rows WHERE id IN ({', '.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+            )
+        return [found.get(chunk_id) for chunk_id in ids]
+
+    def _meta(self, key):
+        # Locked, since close() may run between any two unlocked calls
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _all_meta(self):
+        return dict(self._db.execute("SELECT key, value FROM meta").fetchall())
+
+    def _set_meta(self, key, value):
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
+
+
+def _quantize(embeddings, dtype):
+    # Vectors are normalized first, since the store ranks by cosine. int8
+    # keeps a scale per row so each row uses the whole -127..127 range.
+    import numpy as np
+
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    vectors = embeddings / np.maximum(norms, 1e-12)
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+    quantized = np.clip(np.rint(vectors / scales[:, np.newaxis]), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def _where_clause(where):
+    clauses, params = [], []
+    for key, value in where.items():
+        if not key.isidentifier() or isinstance(value, dict):
+            raise ValueError(f"Only equality filters are supported, got {where}")
+        clauses.append(f"json_extract(metadata, '$.{key}') = ?")
+        params.append(value)
+    return " AND ".join(clauses), params
+
+
+def _open_for_write(path):
+    # Not append mode: rows are written in place at their positions
+    return open(path, "r+b" if os.path.exists(path) else "w+b")
+
+
+def _load_metadata(value):
+    return json.loads(value) if value else None
@@ -1,38 +1,149 @@
 # app/routers/api.py
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends
-from app.models.pdf_processor import PDFProcessor
+from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from app.models.embeddings_manager import (
-    EmbeddingsManager,
-    add_pdf_summary,
-    query_pdf_summaries,
-    get_summary_collection,
     delete_pdf_data,
+    find_pdf_by_hash,
+    get_pdf_summary,
+    query_pdfs,
 )
 from app.models.question_answering import QuestionAnswering
+from app.models.context_builder import ContextBuilder
+from app.models.ingestion import ingest_pdf, replace_pdf
+from app.models.jobs import job_manager, JobQueueFullError
+from app.models.llm_client import LLMUnavailableError
+from app.models.answer_cache import answer_cache
+from app.models.catalog import catalog
+from app.models.semantic_cache import semantic_cache
+from app.models.summary_router import summary_router
 from app.utils.logger import get_logger
 from app.utils.config import Config
-from fastapi.responses import JSONResponse, RedirectResponse
+from app.utils.metrics import collect_timings, render_metrics, stage
+from app.utils.resources import ResourceRegistry, get_resources
+from fastapi.responses import (
+    JSONResponse,
+    RedirectResponse,
+    Response,
+    StreamingResponse,
+)
 from ..schemas import (
     PDFUploadResponse,
+    UploadJobResponse,
+    BulkUploadResult,
+    BulkUploadSummary,
+    JobStatusResponse,
     AskQuestionRequest,
     AskQuestionResponse,
+    AnswerCacheStats,
+    SemanticCacheStats,
     SummaryResponse,
     HealthResponse,
     PDFSummary,
     PurgePDF,
 )
-from chromadb import Client
-from typing import List
+from typing import List, Optional
+import asyncio
+import json
+import math
 import os
+import time
 import uuid
+import hashlib
+import zipfile
+from contextlib import nullcontext
+from functools import partial
 from pathlib import Path
-import shutil
 
 logger = get_logger(__name__)
 router = APIRouter()
 
 
-@router.post("/upload_pdf/", response_model=PDFUploadResponse)
+def get_question_answering(
+    registry: ResourceRegistry = Depends(get_resources),
+) -> QuestionAnswering:
+    return QuestionAnswering(registry=registry)
+
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def _run_ingestion(pdf_id, pdf_path, content_hash, name, report):
+    try:
+        with collect_timings() as timings:
+            result = ingest_pdf(
+                pdf_id, pdf_path, content_hash=content_hash, name=name, report=report
+            )
+    finally:
+        os.remove(pdf_path)
+    return PDFUploadResponse(
+        message="PDF processed and embeddings updated.",
+        pdf_id=result["pdf_id"],
+        summary=result["summary"],
+        failed_pages=result["failed_pages"],
+        timings=timings,
+    ).model_dump()
+
+
+def _run_replace(pdf_id, pdf_path, content_hash, name, report):
+    try:
+        with collect_timings() as timings:
+            result = replace_pdf(
+                pdf_id, pdf_path, content_hash=content_hash, name=name, report=report
+            )
+    finally:
+        os.remove(pdf_path)
+    return PDFUploadResponse(
+        message="PDF replaced and changed pages re-embedded.",
+        timings=timings,
+        **result,
+    ).model_dump()
+
+
+def _save_upload(src, pdf_path) -> str:
+    # Hash while copying so the upload is only read once
+    sha256 = hashlib.sha256()
+    with open(pdf_path, "wb") as f:
+        while chunk := src.read(UPLOAD_CHUNK_SIZE):
+            sha256.update(chunk)
+            f.write(chunk)
+    return sha256.hexdigest()
+
+
+async def _queue_ingestion(pdf_id, pdf_path, content_hash, name):
+    """Queue ingestion of a saved upload, unless the same file is known.
+
+    Returns ``(job, duplicate)``. For a file that is already ingested or
+    being ingested, the upload is deleted and the existing PDF's job is
+    returned. Raises ``JobQueueFullError`` when no more jobs can be queued;
+    the upload is then left for the caller to retry or delete.
+    """
+    existing = await run_in_threadpool(find_pdf_by_hash, content_hash)
+    if existing is not None:
+        os.remove(pdf_path)
+        logger.info(f"Upload matches existing PDF {existing['pdf_id']}")
+        job = job_manager.add_completed(
+            existing["pdf_id"],
+            PDFUploadResponse(message="PDF already processed.", **existing).model_dump(),
+        )
+        return job, True
+
+    job = job_manager.submit(
+        _run_ingestion, pdf_id, pdf_path, content_hash, name, key=content_hash
+    )
+    if job["pdf_id"] != pdf_id:
+        # The same file is already being ingested by another upload
+        os.remove(pdf_path)
+        return job, True
+    return job, False
+
+
+def _new_upload_path():
+    pdf_id = str(uuid.uuid4())
+    os.makedirs(Config.TEMP_PDF_DIR, exist_ok=True)
+    return pdf_id, Path(Config.TEMP_PDF_DIR) / f"{pdf_id}.pdf"
+
+
+@router.post("/upload_pdf/", response_model=UploadJobResponse, status_code=202)
 async def upload_pdf(file: UploadFile = File(...)):
 
     if not file.filename.endswith(".pdf"):
@@ -40,86 +151,520 @@ async def upload_pdf(file: UploadFile = File(...)):
             status_code=400, detail="Invalid file type. Only PDFs are allowed."
         )
     try:
-        pdf_id = str(uuid.uuid4())
-        pdf_name = f"{pdf_id}.pdf"
-        os.makedirs("./tmp", exist_ok=True)
-        pdf_path = Path("./tmp") / pdf_name
+        pdf_id, pdf_path = _new_upload_path()
+        content_hash = await run_in_threadpool(_save_upload, file.file, pdf_path)
 
-        with open(pdf_path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
+        try:
+            job, duplicate = await _queue_ingestion(
+                pdf_id, pdf_path, content_hash, file.filename
+            )
+        except JobQueueFullError as e:
+            os.remove(pdf_path)
+            logger.warning(f"Rejecting upload: {e}")
+            raise HTTPException(
+                status_code=503, detail="Too many PDFs are being processed."
+            )
 
-        pdf_processor = PDFProcessor()
-        question_answering = QuestionAnswering()
-        page_texts = pdf_processor.extract_text_from_pdf(pdf_path)
-        full_text = pdf_processor.get_full_text(page_texts)
-        pdf_summary = question_answering.get_summary(full_text)
+        if not duplicate:
+            message = "PDF accepted for processing."
+        elif job["status"] == "completed":
+            message = "PDF already processed."
+        else:
+            message = "PDF is already being processed."
+        result = job["result"] or {}
+        return UploadJobResponse(
+            message=message,
+            job_id=job["job_id"],
+            pdf_id=job["pdf_id"],
+            status=job["status"],
+            duplicate=duplicate,
+            summary=result.get("summary") if duplicate else None,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing PDF: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error.")
 
-        add_pdf_summary(pdf_id=pdf_id, summary=pdf_summary)
 
-        text_chunks = pdf_processor.tokenize_text(page_texts)
-        embeddings_manager = EmbeddingsManager(pdf_id)
-        embeddings_manager.update_embeddings(text_chunks)
+@router.post("/replace_pdf/{pdf_id}", response_model=UploadJobResponse, status_code=202)
+async def replace_pdf_revision(pdf_id: str, file: UploadFile = File(...)):
+    """Replace an ingested PDF with a new revision, keeping its pdf_id."""
 
-        os.remove(pdf_path)
+    if not file.filename.endswith(".pdf"):
+        raise HTTPException(
+            status_code=400, detail="Invalid file type. Only PDFs are allowed."
+        )
+    existing = await run_in_threadpool(get_pdf_summary, pdf_id)
+    if existing is None:
+        raise HTTPException(status_code=404, detail="PDF ID not found")
+    try:
+        _, pdf_path = _new_upload_path()
+        content_hash = await run_in_threadpool(_save_upload, file.file, pdf_path)
 
-        return PDFUploadResponse(
-            message="PDF processed and embeddings updated.",
+        if content_hash == existing["content_hash"]:
+            os.remove(pdf_path)
+            job = job_manager.add_completed(
+                pdf_id,
+                PDFUploadResponse(
+                    message="PDF unchanged.", pdf_id=pdf_id, summary=existing["summary"]
+                ).model_dump(),
+            )
+            return UploadJobResponse(
+                message="PDF unchanged.",
+                job_id=job["job_id"],
+                pdf_id=pdf_id,
+                status=job["status"],
+                duplicate=True,
+                summary=existing["summary"],
+            )
+
+        key = f"replace:{pdf_id}:{content_hash}"
+        job = job_manager.pending(key)
+        if job is not None:
+            os.remove(pdf_path)
+            return UploadJobResponse(
+                message="PDF replacement is already being processed.",
+                job_id=job["job_id"],
+                pdf_id=pdf_id,
+                status=job["status"],
+                duplicate=True,
+            )
+
+        try:
+            job = job_manager.submit(
+                _run_replace, pdf_id, pdf_path, content_hash, file.filename, key=key
+            )
+        except JobQueueFullError as e:
+            os.remove(pdf_path)
+            logger.warning(f"Rejecting replacement: {e}")
+            raise HTTPException(
+                status_code=503, detail="Too many PDFs are being processed."
+            )
+        return UploadJobResponse(
+            message="PDF replacement accepted for processing.",
+            job_id=job["job_id"],
             pdf_id=pdf_id,
-            summary=pdf_summary,
+            status=job["status"],
         )
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error processing PDF: {e}")
+        logger.error(f"Error replacing PDF: {e}")
         raise HTTPException(status_code=500, detail="Internal server error.")
 
 
-@router.post("/ask_questions/", response_model=AskQuestionResponse)
-async def ask_questions(req: AskQuestionRequest):
+def _bulk_sources(files: List[UploadFile]):
+    # Yields (filename, open_source) for every PDF in the upload; PDFs inside
+    # zip archives are only read when open_source() is called
+    for file in files:
+        name = file.filename or ""
+        if name.lower().endswith(".zip"):
+            try:
+                archive = zipfile.ZipFile(file.file)
+            except zipfile.BadZipFile:
+                yield name, None
+                continue
+            for member in archive.infolist():
+                if member.is_dir() or member.filename.startswith("__MACOSX/"):
+                    continue
+                member_name = f"{name}/{member.filename}"
+                if member.file_size > Config.BULK_MAX_FILE_MB * 1024 * 1024:
+                    yield member_name, None
+                else:
+                    yield member_name, partial(archive.open, member)
+        else:
+            yield name, partial(nullcontext, file.file)
+
+
+def _save_source(open_source, pdf_path) -> str:
+    with open_source() as src:
+        return _save_upload(src, pdf_path)
+
+
+async def _bulk_ingest_one(filename, open_source) -> BulkUploadResult:
+    if open_source is None or not filename.lower().endswith(".pdf"):
+        return BulkUploadResult(
+            filename=filename, status="failed", error="Not a readable PDF file."
+        )
+    pdf_id, pdf_path = _new_upload_path()
     try:
-        pdf_id_to_use = req.pdf_id
-        if pdf_id_to_use is None:
-            # query pdf_summaries
-            if not req.questions:
-                raise HTTPException(
-                    status_code=400, detail="No question provided and no pdf_id."
+        content_hash = await run_in_threadpool(_save_source, open_source, pdf_path)
+        while True:
+            try:
+                job, duplicate = await _queue_ingestion(
+                    pdf_id, pdf_path, content_hash, filename
                 )
-            # We'll just use the first question to determine the best pdf
-            query = req.questions[0]
-            pdf_results = query_pdf_summaries(query, top_k=1)
-            if not pdf_results or not pdf_results.get("documents"):
-                # No suitable PDF found
-                for q in req.questions:
-                    answers[q] = {
-                        "answer": "Data Not Available",
-                        "confidence": None,
-                        "source": None,
-                    }
-                return AskQuestionResponse(answers=answers)
-
-            # Extract the pdf_id from metadata
-            pdf_id_to_use = pdf_results["metadatas"][0][0].get("pdf_id")
-
-        question_answering = QuestionAnswering()
-        answers = {}
+                break
+            except JobQueueFullError:
+                # Other uploads filled the queue; wait for room instead of
+                # failing the file
+                await asyncio.sleep(1)
+        future = job_manager.future(job["job_id"])
+        if future is not None:
+            await asyncio.wrap_future(future)
+        job = job_manager.get(job["job_id"]) or job
+    except Exception as e:
+        if os.path.exists(pdf_path):
+            os.remove(pdf_path)
+        logger.error(f"Bulk upload of {filename} failed: {e}")
+        return BulkUploadResult(filename=filename, status="failed", error=str(e))
 
-        embeddings_manager = EmbeddingsManager(pdf_id_to_use)
+    result = job["result"] or {}
+    return BulkUploadResult(
+        filename=filename,
+        status="failed" if job["status"] == "failed" else ("duplicate" if duplicate else "completed"),
+        pdf_id=job["pdf_id"],
+        job_id=job["job_id"],
+        summary=result.get("summary"),
+        failed_pages=result.get("failed_pages", []),
+        error=job["error"],
+    )
 
-        for question in req.questions:
-            results = embeddings_manager.query_embeddings(question)
-            if results and results["documents"]:
-                top_chunks = results["documents"][0]
-                context = "\n\n".join(top_chunks)
-                answer = question_answering.get_answer(context, question)
-                if answer and answer != "Data Not Available":
-                    answers[question] = answer
+
+@router.post("/upload_pdfs/")
+async def upload_pdfs(files: List[UploadFile] = File(...)):
+    """Ingest many PDFs and/or zip archives of PDFs, streaming NDJSON results."""
+
+    async def results():
+        counts = {"completed": 0, "duplicate": 0, "failed": 0}
+        in_flight = set()
+
+        def finished(tasks):
+            for task in tasks:
+                result = task.result()
+                counts[result.status] += 1
+                yield result.model_dump_json() + "\n"
+
+        try:
+            for filename, open_source in _bulk_sources(files):
+                if len(in_flight) >= Config.BULK_MAX_IN_FLIGHT:
+                    done, in_flight = await asyncio.wait(
+                        in_flight, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for line in finished(done):
+                        yield line
+                in_flight.add(
+                    asyncio.ensure_future(_bulk_ingest_one(filename, open_source))
+                )
+            while in_flight:
+                done, in_flight = await asyncio.wait(
+                    in_flight, return_when=asyncio.FIRST_COMPLETED
+                )
+                for line in finished(done):
+                    yield line
+        finally:
+            # Client went away: queued jobs keep running, but stop waiting
+            for task in in_flight:
+                task.cancel()
+        yield BulkUploadSummary(**counts).model_dump_json() + "\n"
+
+    return StreamingResponse(
+        results(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+def get_job_status(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job ID not found")
+    return JobStatusResponse(**job)
+
+
+async def _route_questions(req: AskQuestionRequest, registry: ResourceRegistry):
+    """Decide which PDF(s) answer each question.
+
+    Returns ``(routes, query_embeddings)``. ``routes`` is a list of
+    ``(pdf_ids, question_indexes)``: every question goes to the requested
+    pdf_id, or else to the ``ROUTE_TOP_PDFS`` PDFs whose summaries match it
+    best (none if there are no PDFs). When routing, or when the semantic
+    cache needs them, the question embeddings are returned for reuse by
+    retrieval.
+    """
+    if req.pdf_id is not None:
+        routes = [((req.pdf_id,), list(range(len(req.questions))))]
+        if not (Config.SEMANTIC_CACHE_ENABLED and req.questions):
+            return routes, None
+        # Embedded here instead of in retrieval, to look up the cache first
+        with stage("retrieve"):
+            query_embeddings = await run_in_threadpool(
+                registry.embedding_function, list(req.questions)
+            )
+        return routes, query_embeddings
+    if not req.questions:
+        raise HTTPException(status_code=400, detail="No question provided and no pdf_id.")
+
+    def route():
+        query_embeddings = registry.embedding_function(list(req.questions))
+        return (
+            summary_router.route(query_embeddings, top_k=Config.ROUTE_TOP_PDFS),
+            query_embeddings,
+        )
+
+    with stage("route"):
+        per_question, query_embeddings = await run_in_threadpool(route)
+    routes = {}
+    for index, pdf_ids in enumerate(per_question):
+        if pdf_ids:
+            routes.setdefault(tuple(pdf_ids), []).append(index)
+    return list(routes.items()), query_embeddings
+
+
+def _cached_answers(req: AskQuestionRequest, routes, query_embeddings):
+    """Answer what the semantic cache can.
+
+    Returns ``(cached, routes)``: the cached answer of each question that
+    hit, by question, and the routes left with only the questions to answer.
+    """
+    if not Config.SEMANTIC_CACHE_ENABLED:
+        return {}, routes
+    cached, remaining = {}, []
+    with stage("semantic_cache"):
+        for pdf_ids, indexes in routes:
+            answers = semantic_cache.lookup(
+                pdf_ids[0],
+                [req.questions[index] for index in indexes],
+                [query_embeddings[index] for index in indexes],
+            )
+            missed = []
+            for index, answer in zip(indexes, answers):
+                if answer is None:
+                    missed.append(index)
                 else:
-                    answers[question] = "Data Not Available"
+                    cached[req.questions[index]] = answer
+            if missed:
+                remaining.append((pdf_ids, missed))
+    return cached, remaining
+
+
+def _remember_answers(req: AskQuestionRequest, retrieved, query_embeddings, answered, seconds):
+    # Add fresh answers to the semantic cache, along with the time it took
+    # to retrieve and answer them
+    if not Config.SEMANTIC_CACHE_ENABLED or not retrieved:
+        return
+    count = 0
+    for pdf_id, indexes, _ in retrieved:
+        for index in indexes:
+            answer = answered.get(req.questions[index])
+            if answer and answer != "Data Not Available":
+                semantic_cache.put(
+                    pdf_id, req.questions[index], query_embeddings[index], answer
+                )
+            count += 1
+    semantic_cache.record_answer_time(count, seconds)
+
+
+async def _retrieve(req: AskQuestionRequest, routes, query_embeddings, registry):
+    # One (pdf_id, question_indexes, results) per route; pdf_id is the best
+    # match, under which answers are cached
+    def retrieve(pdf_ids, indexes):
+        return query_pdfs(
+            pdf_ids,
+            [req.questions[index] for index in indexes],
+            n_results=req.top_k or 3,
+            query_embeddings=(
+                None
+                if query_embeddings is None
+                else [query_embeddings[index] for index in indexes]
+            ),
+            registry=registry,
+        )
+
+    with stage("retrieve"):
+        results = await asyncio.gather(
+            *(run_in_threadpool(retrieve, pdf_ids, indexes) for pdf_ids, indexes in routes)
+        )
+    return [
+        (pdf_ids[0], indexes, result)
+        for (pdf_ids, indexes), result in zip(routes, results)
+    ]
+
+
+def _answer_items(req: AskQuestionRequest, retrieved, share_context=None):
+    # (context, question) pairs to answer and the pdf_id of each; questions
+    # that retrieved nothing are left out
+    items, pdf_ids = [], []
+    builder = ContextBuilder(share_context=share_context)
+    for pdf_id, indexes, results in retrieved:
+        for index, context in zip(indexes, builder.build(results)):
+            if context:
+                items.append((context, req.questions[index]))
+                pdf_ids.append(pdf_id)
+    return items, pdf_ids
+
+
+@router.post("/ask_questions/", response_model=AskQuestionResponse)
+async def ask_questions(
+    req: AskQuestionRequest,
+    question_answering: QuestionAnswering = Depends(get_question_answering),
+    registry: ResourceRegistry = Depends(get_resources),
+):
+    try:
+        answers = {}
+        routes, query_embeddings = await _route_questions(req, registry)
+        if not routes:
+            # No suitable PDF found
+            for q in req.questions:
+                answers[q] = {
+                    "answer": "Data Not Available",
+                    "confidence": None,
+                    "source": None,
+                }
+            return AskQuestionResponse(answers=answers)
+
+        cached, routes = _cached_answers(req, routes, query_embeddings)
+        start = time.perf_counter()
+        retrieved = await _retrieve(req, routes, query_embeddings, registry)
+        if req.batch_questions:
+            groups, group_pdf_ids = [], []
+            for pdf_id, indexes, results in retrieved:
+                for context, positions in ContextBuilder().build_groups(results):
+                    groups.append(
+                        (context, [req.questions[indexes[position]] for position in positions])
+                    )
+                    group_pdf_ids.append(pdf_id)
+            with stage("answer"):
+                answered = await question_answering.aget_batch_answers(
+                    groups, pdf_ids=group_pdf_ids
+                )
+        else:
+            to_answer, pdf_ids = _answer_items(req, retrieved)
+            with stage("answer"):
+                llm_answers = await question_answering.aget_answers(
+                    to_answer, pdf_ids=pdf_ids
+                )
+            answered = {
+                question: answer
+                for (_, question), answer in zip(to_answer, llm_answers)
+            }
+        await run_in_threadpool(
+            _remember_answers,
+            req,
+            retrieved,
+            query_embeddings,
+            answered,
+            time.perf_counter() - start,
+        )
+        answered.update(cached)
+        for question in req.questions:
+            answer = answered.get(question)
+            if answer and answer != "Data Not Available":
+                answers[question] = answer
             else:
                 answers[question] = "Data Not Available"
         return JSONResponse(content=answers)
+    except HTTPException:
+        raise
+    except asyncio.TimeoutError:
+        logger.error("Timed out waiting for answers from LLM")
+        raise HTTPException(status_code=504, detail="Timed out waiting for answers.")
+    except LLMUnavailableError as e:
+        raise _llm_unavailable(e)
+    except Exception as e:
+        logger.error(f"Error answering questions: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error.")
+
+
+def _llm_unavailable(error: LLMUnavailableError) -> HTTPException:
+    # Passed on as a rate limit or an outage, with the wait Anthropic asked
+    # for, so clients can back off instead of seeing a generic 500
+    headers = None
+    if error.retry_after:
+        headers = {"Retry-After": str(math.ceil(error.retry_after))}
+    if error.rate_limited:
+        return HTTPException(
+            status_code=429, detail="LLM rate limit reached, retry later.", headers=headers
+        )
+    return HTTPException(
+        status_code=503, detail="LLM temporarily unavailable, retry later.", headers=headers
+    )
+
+
+def _format_event(event: dict, ndjson: bool) -> str:
+    if ndjson:
+        return json.dumps(event) + "\n"
+    data = {key: value for key, value in event.items() if key != "event"}
+    return f"event: {event['event']}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/ask_questions/stream")
+async def ask_questions_stream(
+    req: AskQuestionRequest,
+    request: Request,
+    question_answering: QuestionAnswering = Depends(get_question_answering),
+    registry: ResourceRegistry = Depends(get_resources),
+):
+    # Routing and retrieval happen before the response starts, so their
+    # errors still get a proper status code
+    try:
+        routes, query_embeddings = await _route_questions(req, registry)
+        cached, routes = _cached_answers(req, routes, query_embeddings)
+        start = time.perf_counter()
+        retrieved = await _retrieve(req, routes, query_embeddings, registry)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error answering questions: {e}")
         raise HTTPException(status_code=500, detail="Internal server error.")
 
+    ndjson = "application/x-ndjson" in request.headers.get("accept", "")
+    # Streamed answers are not primed, so a shared context would only make
+    # every call write its own cache entry
+    to_answer, pdf_ids = _answer_items(req, retrieved, share_context=False)
+    with_context = {question for _, question in to_answer}
+
+    async def events():
+        answered = {}
+        with stage("answer"):
+            for question in req.questions:
+                if question in cached:
+                    yield _format_event(
+                        {
+                            "event": "answer",
+                            "question": question,
+                            "answer": cached[question],
+                            "cached": True,
+                        },
+                        ndjson,
+                    )
+                elif question not in with_context:
+                    yield _format_event(
+                        {"event": "answer", "question": question, "answer": "Data Not Available"},
+                        ndjson,
+                    )
+            async for event in question_answering.astream_answers(
+                to_answer, pdf_ids=pdf_ids
+            ):
+                question = to_answer[event.pop("index")][1]
+                if event["event"] == "answer" and not event["answer"]:
+                    event["answer"] = "Data Not Available"
+                elif event["event"] == "answer":
+                    answered[question] = event["answer"]
+                elif event["event"] == "error":
+                    event["detail"] = "Error getting answer."
+                yield _format_event(
+                    {"event": event.pop("event"), "question": question, **event}, ndjson
+                )
+        await run_in_threadpool(
+            _remember_answers,
+            req,
+            retrieved,
+            query_embeddings,
+            answered,
+            time.perf_counter() - start,
+        )
+        yield _format_event({"event": "done"}, ndjson)
+
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson" if ndjson else "text/event-stream",
+        # Stop proxies (e.g. nginx) from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 @router.get("/")
 def redirection_route():
@@ -132,18 +677,50 @@ def health_check():
     return HealthResponse(status="ok")
 
 
-@router.get("/existing_pdfs", response_model=List[PDFSummary])
-def get_all_pdf_summaries():
-    col = get_summary_collection()
-    all_data = col.get()  # Retrieve all documents from the pdf_summaries collection
-    documents = all_data.get("documents", [])
-    metadatas = all_data.get("metadatas", [])
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    content, media_type = render_metrics()
+    return Response(content=content, media_type=media_type)
+
+
+@router.get("/answer_cache/stats", response_model=AnswerCacheStats)
+def get_answer_cache_stats():
+    return AnswerCacheStats(**answer_cache.stats())
 
-    results = []
-    for doc, meta in zip(documents, metadatas):
-        pdf_id = meta.get("pdf_id")
-        summary = doc
-        results.append(PDFSummary(pdf_id=pdf_id, summary=summary))
+
+@router.get("/semantic_cache/stats", response_model=SemanticCacheStats)
+def get_semantic_cache_stats():
+    return SemanticCacheStats(**semantic_cache.stats())
+
+
+@router.get(
+    "/existing_pdfs",
+    response_model=List[PDFSummary],
+    response_model_exclude_unset=True,
+)
+def get_all_pdf_summaries(
+    response: Response,
+    limit: int = Query(Config.EXISTING_PDFS_PAGE_SIZE, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """List ingested PDFs, one page at a time.
+
+    ``fields`` is a comma-separated subset of the catalog fields (default
+    ``pdf_id,summary``). When there are more PDFs, the ``X-Next-Cursor``
+    response header holds the ``cursor`` for the next page.
+    """
+    selected = (
+        [field.strip() for field in fields.split(",") if field.strip()]
+        if fields
+        else ["pdf_id", "summary"]
+    )
+    try:
+        results, next_cursor = catalog.list(limit, cursor=cursor, fields=selected)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
     return results
 
 
@@ -2,22 +2,96 @@ from pydantic import BaseModel
 from typing import Optional, List, Dict
 
 
+class ReplaceStats(BaseModel):
+    revision: int
+    pages: int
+    changed_pages: int
+    changed_ratio: float  # fraction of the text that changed
+    chunks_kept: int
+    chunks_added: int
+    chunks_deleted: int
+    resummarized: bool
+
+
 class PDFUploadResponse(BaseModel):
     message: str
     pdf_id: str
     summary: str
+    failed_pages: List[int] = []
+    timings: Dict[str, float] = {}  # seconds spent in each ingestion stage
+    replace: Optional[ReplaceStats] = None  # set for /replace_pdf jobs
+
+
+class UploadJobResponse(BaseModel):
+    message: str
+    job_id: str
+    pdf_id: str
+    status: str = "queued"
+    duplicate: bool = False
+    summary: Optional[str] = None
+
+
+class BulkUploadResult(BaseModel):
+    filename: str  # "archive.zip/inner/path.pdf" for files from a zip
+    status: str  # completed | duplicate | failed
+    pdf_id: Optional[str] = None
+    job_id: Optional[str] = None
+    summary: Optional[str] = None
+    failed_pages: List[int] = []
+    error: Optional[str] = None
+
+
+class BulkUploadSummary(BaseModel):
+    done: bool = True
+    completed: int
+    duplicate: int
+    failed: int
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    pdf_id: str
+    status: str  # queued | running | completed | failed
+    stage: str
+    progress: float
+    result: Optional[PDFUploadResponse] = None
+    error: Optional[str] = None
 
 
 class AskQuestionRequest(BaseModel):
     questions: List[str]
     pdf_id: Optional[str] = None
     top_k: Optional[int] = 3
+    # Answer questions that share context together, in one LLM call per group
+    batch_questions: bool = False
 
 
 class AskQuestionResponse(BaseModel):
     answers: Dict[str, Dict]  # {question: {answer, confidence, source}}
 
 
+class AnswerCacheStats(BaseModel):
+    memory_hits: int
+    disk_hits: int
+    misses: int
+    hit_rate: float
+    memory_entries: int
+    disk_entries: int
+
+
+class SemanticCacheStats(BaseModel):
+    hits: int
+    misses: int
+    hit_rate: float
+    entries: int
+    pdfs: int
+    evictions: int
+    threshold: float
+    mean_lookup_ms: float
+    mean_answer_ms: float
+    estimated_seconds_saved: float
+
+
 class SummaryResponse(BaseModel):
     summary: str
 
@@ -27,8 +101,15 @@ class HealthResponse(BaseModel):
 
 
 class PDFSummary(BaseModel):
+    # Only the fields requested from /existing_pdfs are returned
     pdf_id: str
-    summary: str
+    summary: Optional[str] = None
+    name: Optional[str] = None  # uploaded filename
+    content_hash: Optional[str] = None  # sha256 of the uploaded file
+    pages: Optional[int] = None
+    chunks: Optional[int] = None
+    size_bytes: Optional[int] = None
+    created_at: Optional[float] = None  # Unix time
 
 
 class PurgePDF(BaseModel):
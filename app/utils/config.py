@@ -13,3 +13,84 @@ class Config:
     TEMP_PDF_DIR = os.getenv("TEMP_PDF_DIR", "./temp_pdfs")  # Store temp pdfs
     ANSWER_MODEL = "claude-3-5-haiku-20241022"  # or another Claude model variant
     SUMMARY_MODEL = "claude-3-haiku-20240307"  # model to use while creating summary
+    # Anthropic calls: client-side budget per process (0 = no limit), retries
+    # with jittered exponential backoff, and sharing of identical calls
+    LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+    LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+    LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+    LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "20"))
+    LLM_COALESCE = os.getenv("LLM_COALESCE", "true").lower() == "true"
+    # Background ingestion for /upload_pdf
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+    INGEST_MAX_PENDING_JOBS = int(os.getenv("INGEST_MAX_PENDING_JOBS", "64"))
+    INGEST_MAX_FINISHED_JOBS = int(os.getenv("INGEST_MAX_FINISHED_JOBS", "1000"))
+    # /upload_pdfs: files of one bulk request queued or ingesting at once
+    BULK_MAX_IN_FLIGHT = int(os.getenv("BULK_MAX_IN_FLIGHT", str(INGEST_WORKERS * 2)))
+    BULK_MAX_FILE_MB = int(os.getenv("BULK_MAX_FILE_MB", "200"))  # per zip member
+    # /replace_pdf: regenerate the summary when this fraction of the text changed
+    REPLACE_RESUMMARIZE_RATIO = float(os.getenv("REPLACE_RESUMMARIZE_RATIO", "0.2"))
+    # Chunk storage: "per_pdf" (one Chroma collection per PDF) or "shared"
+    # (one collection for all PDFs, queried with a pdf_id filter). Existing
+    # collections are moved with `python -m app.migrate_layout`.
+    VECTOR_LAYOUT = os.getenv("VECTOR_LAYOUT", "per_pdf")
+    # Where vectors live: "chroma", or "memmap" (quantized vectors in
+    # memory-mapped files under MEMMAP_DIR, shared by all worker processes,
+    # searched exactly). MEMMAP_DTYPE is "int8" or "float16".
+    VECTOR_STORE = os.getenv("VECTOR_STORE", "chroma")
+    MEMMAP_DIR = os.getenv("MEMMAP_DIR", os.path.join(CHROMADB_PERSIST_DIR, "memmap"))
+    MEMMAP_DTYPE = os.getenv("MEMMAP_DTYPE", "int8")
+    # Collection handles kept open per process; a memmap collection holds
+    # about five file descriptors
+    MAX_OPEN_COLLECTIONS = int(os.getenv("MAX_OPEN_COLLECTIONS", "128"))
+    # Parallel page extraction for large PDFs
+    EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+    PARALLEL_EXTRACT_MIN_PAGES = int(os.getenv("PARALLEL_EXTRACT_MIN_PAGES", "50"))
+    # Streaming ingestion
+    EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))  # chunks per embed/add
+    EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", str(min(4, os.cpu_count() or 1))))
+    # Map-reduce summarization
+    SUMMARY_SECTION_TOKENS = int(os.getenv("SUMMARY_SECTION_TOKENS", "20000"))
+    SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))  # in-flight calls
+    # Questions asked without a pdf_id go to the PDFs whose summaries match
+    # them best (in-memory summary matrix); more than one merges their chunks
+    ROUTE_TOP_PDFS = int(os.getenv("ROUTE_TOP_PDFS", "1"))
+    # Concurrent answering in /ask_questions
+    ANSWER_CONCURRENCY = int(os.getenv("ANSWER_CONCURRENCY", "8"))  # in-flight calls
+    ANSWER_TIMEOUT_SECONDS = float(os.getenv("ANSWER_TIMEOUT_SECONDS", "30"))
+    # batch_questions mode: questions answered together in one call
+    ANSWER_BATCH_MAX_QUESTIONS = int(os.getenv("ANSWER_BATCH_MAX_QUESTIONS", "8"))
+    # Answer prompts: retrieved context is deduplicated and capped at this size
+    CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "6000"))
+    # Mark the context for Anthropic prompt caching; with PROMPT_CACHE_PRIME
+    # one question is answered before the rest so they can read the cache
+    PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "true").lower() == "true"
+    PROMPT_CACHE_PRIME = os.getenv("PROMPT_CACHE_PRIME", "false").lower() == "true"
+    PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "2048"))
+    # Answer cache (in-process LRU + SQLite file)
+    ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    ANSWER_CACHE_PATH = os.getenv(
+        "ANSWER_CACHE_PATH", os.path.join(CHROMADB_PERSIST_DIR, "answer_cache.sqlite3")
+    )
+    ANSWER_CACHE_MEMORY_ENTRIES = int(os.getenv("ANSWER_CACHE_MEMORY_ENTRIES", "10000"))
+    # Semantic cache: a question whose embedding is at least this similar
+    # (cosine) to one already answered for the PDF reuses its answer, with
+    # no retrieval or LLM call. In memory, LRU over all PDFs.
+    SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "10000"))
+    # Catalog of ingested PDFs (SQLite) backing /existing_pdfs and purge
+    CATALOG_PATH = os.getenv(
+        "CATALOG_PATH", os.path.join(CHROMADB_PERSIST_DIR, "catalog.sqlite3")
+    )
+    EXISTING_PDFS_PAGE_SIZE = int(os.getenv("EXISTING_PDFS_PAGE_SIZE", "100"))
+    # Load the embedding model and open the summary index at startup
+    WARM_UP_ON_STARTUP = os.getenv("WARM_UP_ON_STARTUP", "true").lower() == "true"
+    # nltk tokenizer data: checked in NLTK_DATA_DIR first, downloaded only if
+    # missing and NLTK_DOWNLOAD is enabled
+    NLTK_DATA_DIR = os.getenv("NLTK_DATA_DIR")
+    NLTK_DOWNLOAD = os.getenv("NLTK_DOWNLOAD", "true").lower() == "true"
+    # Chunking: "offset" (regex token offsets) or "nltk" (legacy word_tokenize)
+    CHUNKER = os.getenv("CHUNKER", "offset")
+    CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "50"))
+    CHUNK_CROSS_PAGES = os.getenv("CHUNK_CROSS_PAGES", "true").lower() == "true"
@@ -0,0 +1,240 @@
+# app/utils/metrics.py
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram(
+    "pdf_qa_stage_seconds",
+    "Time spent in each stage of ingestion and question answering",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "pdf_qa_http_request_seconds",
+    "HTTP request latency until the response headers are sent",
+    ["method", "route", "status"],
+    buckets=STAGE_BUCKETS,
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "pdf_qa_llm_request_seconds",
+    "Latency of calls to the Anthropic API",
+    ["purpose", "model", "outcome"],
+    buckets=STAGE_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "pdf_qa_llm_tokens",
+    "Tokens used by calls to the Anthropic API",
+    ["purpose", "model", "direction"],
+)
+LLM_RETRIES = Counter(
+    "pdf_qa_llm_retries",
+    "Anthropic API calls retried, by reason (rate_limit, status code or connection)",
+    ["purpose", "reason"],
+)
+LLM_COALESCED = Counter(
+    "pdf_qa_llm_coalesced",
+    "Anthropic API calls saved by sharing an identical call already in flight",
+    ["purpose"],
+)
+LLM_THROTTLED_SECONDS = Counter(
+    "pdf_qa_llm_throttled_seconds",
+    "Time calls waited for the client-side requests/tokens per minute budget",
+    ["purpose"],
+)
+
+# Stage timings of the current request or ingestion job, in seconds
+_timings: ContextVar = ContextVar("stage_timings", default=None)
+# The innermost running stage, so nested stages can be excluded from it
+_current_stage: ContextVar = ContextVar("current_stage", default=None)
+
+
+class _StageFrame:
+    __slots__ = ("nested", "elapsed")
+
+    def __init__(self):
+        self.nested = 0.0
+        self.elapsed = 0.0
+
+
+@contextmanager
+def collect_timings():
+    """Collect the stages timed in this context into the yielded dict."""
+    timings = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def record_stage(name, seconds):
+    STAGE_SECONDS.labels(stage=name).observe(seconds)
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def _exclusive_timer():
+    # Sets frame.elapsed to the time spent in the block minus the time spent
+    # in stages nested inside it, so that stages never overlap
+    parent = _current_stage.get()
+    frame = _StageFrame()
+    token = _current_stage.set(frame)
+    start = time.perf_counter()
+    try:
+        yield frame
+    finally:
+        duration = time.perf_counter() - start
+        _current_stage.reset(token)
+        if parent is not None:
+            parent.nested += duration
+        frame.elapsed = duration - frame.nested
+
+
+@contextmanager
+def stage(name):
+    """Time the body of the ``with`` block as one occurrence of ``name``."""
+    try:
+        with _exclusive_timer() as frame:
+            yield
+    finally:
+        record_stage(name, frame.elapsed)
+
+
+class StageTimer:
+    """Accumulates a stage that is entered many times, e.g. once per page.
+
+    Use as a context manager around each piece of work, then call
+    ``record`` once so the histogram gets one observation for the total.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.elapsed = 0.0
+        self._timers = []
+
+    def __enter__(self):
+        timer = _exclusive_timer()
+        self._timers.append((timer, timer.__enter__()))
+        return self
+
+    def __exit__(self, *exc_info):
+        timer, frame = self._timers.pop()
+        timer.__exit__(*exc_info)
+        self.elapsed += frame.elapsed
+        return False
+
+    def record(self):
+        record_stage(self.name, self.elapsed)
+
+
+def timed_iter(name, iterable):
+    """Yield from ``iterable``, timing the work of producing its items.
+
+    This is how streaming stages (extract → chunk → embed) are measured: only
+    the time spent inside the iterator counts, minus any stage it pulls from.
+    The total is recorded once, when the iterator is exhausted or closed.
+    """
+    iterator = iter(iterable)
+    timer = StageTimer(name)
+    done = object()
+    try:
+        while True:
+            with timer:
+                item = next(iterator, done)
+            if item is done:
+                return
+            yield item
+    finally:
+        timer.record()
+
+
+@contextmanager
+def llm_call(purpose, model):
+    """Time one Anthropic API call and count it by outcome."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        LLM_REQUEST_SECONDS.labels(purpose=purpose, model=model, outcome=outcome).observe(
+            time.perf_counter() - start
+        )
+
+
+def record_llm_usage(purpose, model, usage):
+    if usage is None:
+        return
+    LLM_TOKENS.labels(purpose=purpose, model=model, direction="input").inc(
+        usage.input_tokens or 0
+    )
+    LLM_TOKENS.labels(purpose=purpose, model=model, direction="output").inc(
+        usage.output_tokens or 0
+    )
+    # Prompt caching: tokens written to and read from the cache are billed
+    # separately from (and not included in) input_tokens
+    LLM_TOKENS.labels(purpose=purpose, model=model, direction="cache_write").inc(
+        getattr(usage, "cache_creation_input_tokens", None) or 0
+    )
+    LLM_TOKENS.labels(purpose=purpose, model=model, direction="cache_read").inc(
+        getattr(usage, "cache_read_input_tokens", None) or 0
+    )
+
+
+def server_timing(timings):
+    return ", ".join(
+        f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()
+    )
+
+
+def render_metrics():
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """Records request latency and adds a ``Server-Timing`` header.
+
+    The header lists the stages timed while handling the request, e.g.
+    ``route;dur=12.0, retrieve;dur=35.2, answer;dur=812.4, total;dur=861.3``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+
+        with collect_timings() as timings:
+
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    elapsed = time.perf_counter() - start
+                    route = scope.get("route")
+                    REQUEST_SECONDS.labels(
+                        method=scope["method"],
+                        # The route template, so ids don't explode the label set
+                        route=getattr(route, "path", "unmatched"),
+                        status=str(message["status"]),
+                    ).observe(elapsed)
+                    header = server_timing({**timings, "total": elapsed})
+                    message = {
+                        **message,
+                        "headers": [
+                            *message.get("headers", []),
+                            (b"server-timing", header.encode("latin-1")),
+                        ],
+                    }
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
@@ -0,0 +1,154 @@
+# app/utils/resources.py
+
+import threading
+from collections import OrderedDict
+from app.utils.config import Config
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SUMMARY_COLLECTION = "pdf_summaries"
+# Chunks of every PDF when VECTOR_LAYOUT is "shared"
+CHUNK_COLLECTION = "pdf_chunks"
+
+
+class ResourceRegistry:
+    """Process-wide owner of clients that are expensive to create.
+
+    The vector store (``VECTOR_STORE``), the embedding function (and its
+    ONNX session), collection handles, the Anthropic HTTP clients and the
+    ``LLMClient`` wrapping them are created on first use and then shared by
+    every request and ingestion job. chromadb and anthropic are only
+    imported at that point, which keeps startup fast. At most
+    ``MAX_OPEN_COLLECTIONS`` collection handles are kept; the least recently
+    used are released (their files closed) beyond that.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._chroma_client = None
+        self._vector_store = None
+        self._embedding_function = None
+        self._collections = OrderedDict()  # name -> handle, oldest first
+        self._anthropic = None
+        self._async_anthropic = None
+        self._llm = None
+
+    @property
+    def chroma_client(self):
+        with self._lock:
+            if self._chroma_client is None:
+                import chromadb
+
+                self._chroma_client = chromadb.PersistentClient(
+                    path=Config.CHROMADB_PERSIST_DIR
+                )
+            return self._chroma_client
+
+    @property
+    def embedding_function(self):
+        with self._lock:
+            if self._embedding_function is None:
+                from chromadb.utils import embedding_functions
+
+                self._embedding_function = embedding_functions.DefaultEmbeddingFunction()
+            return self._embedding_function
+
+    @property
+    def vector_store(self):
+        with self._lock:
+            if self._vector_store is None:
+                from app.models.vector_store import ChromaVectorStore, MemmapVectorStore
+
+                if Config.VECTOR_STORE == "memmap":
+                    self._vector_store = MemmapVectorStore(
+                        path=Config.MEMMAP_DIR, dtype=Config.MEMMAP_DTYPE
+                    )
+                elif Config.VECTOR_STORE == "chroma":
+                    self._vector_store = ChromaVectorStore(
+                        self.chroma_client, self.embedding_function
+                    )
+                else:
+                    raise ValueError(
+                        f"Unknown VECTOR_STORE {Config.VECTOR_STORE!r}, use chroma or memmap"
+                    )
+            return self._vector_store
+
+    def get_collection(self, name):
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = self.vector_store.get_collection(name)
+                self._collections[name] = collection
+            self._collections.move_to_end(name)
+            while len(self._collections) > Config.MAX_OPEN_COLLECTIONS:
+                _, evicted = self._collections.popitem(last=False)
+                self.vector_store.release(evicted)
+            return collection
+
+    def delete_collection(self, name):
+        with self._lock:
+            collection = self._collections.pop(name, None)
+            if collection is not None:
+                self.vector_store.release(collection)
+            self.vector_store.delete_collection(name)
+
+    def list_collections(self):
+        return self.vector_store.list_collections()
+
+    @property
+    def anthropic(self):
+        with self._lock:
+            if self._anthropic is None:
+                from anthropic import Anthropic
+
+                # Retries are done by LLMClient, which also honours the budget
+                self._anthropic = Anthropic(api_key=Config.ANTHROPIC_API_KEY, max_retries=0)
+            return self._anthropic
+
+    @property
+    def async_anthropic(self):
+        with self._lock:
+            if self._async_anthropic is None:
+                from anthropic import AsyncAnthropic
+
+                self._async_anthropic = AsyncAnthropic(
+                    api_key=Config.ANTHROPIC_API_KEY, max_retries=0
+                )
+            return self._async_anthropic
+
+    @property
+    def llm(self):
+        # Rate limiting, retries and coalescing for every Anthropic call
+        with self._lock:
+            if self._llm is None:
+                from app.models.llm_client import LLMClient
+
+                self._llm = LLMClient(self)
+            return self._llm
+
+    def warm_up(self):
+        # Load the embedding model and open the summary index before the
+        # first request needs them
+        self.embedding_function(["warm up"])
+        self.get_collection(SUMMARY_COLLECTION)
+        logger.info("Embedding model and summary collection are ready")
+
+    async def aclose(self):
+        with self._lock:
+            sync_client, async_client = self._anthropic, self._async_anthropic
+            self._anthropic = self._async_anthropic = None
+            for collection in self._collections.values():
+                self.vector_store.release(collection)
+            self._collections.clear()
+        if sync_client is not None:
+            sync_client.close()
+        if async_client is not None:
+            await async_client.close()
+
+
+resources = ResourceRegistry()
+
+
+def get_resources() -> ResourceRegistry:
+    return resources
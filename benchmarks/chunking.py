@@ -0,0 +1,89 @@
+"""Chunking benchmark: OffsetChunker throughput against the legacy nltk path.
+
+Run from the repository root:
+
+    python -m benchmarks.chunking --pages 500 --output chunking.json
+    python -m benchmarks.chunking --pdf some.pdf
+
+Text comes from a PDF when --pdf is given, otherwise synthetic pages are
+generated. Throughput is reported in MB/s of page text (UTF-8).
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks.common import write_results
+from app.models.chunker import OffsetChunker
+from app.models.pdf_processor import PDFProcessor
+from app.utils.config import Config
+
+WORDS = (
+    "the agreement shall terminate upon thirty (30) days written notice; "
+    "provided, however, that either party may, at its sole discretion, "
+    "extend the term. Section 4.2 revenue increased 12.5% year-over-year "
+    "to $1,204 million, driven by services and subscriptions."
+).split()
+
+
+def synthetic_pages(num_pages, words_per_page, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            "page_number": page_number,
+            "text": " ".join(rng.choice(WORDS) for _ in range(words_per_page)),
+        }
+        for page_number in range(1, num_pages + 1)
+    ]
+
+
+def measure(chunk_fn, pages, repeat):
+    size_mb = sum(len(page["text"].encode("utf-8")) for page in pages) / 1e6
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        num_chunks = sum(1 for _ in chunk_fn(pages))
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {
+        "chunks": num_chunks,
+        "best_s": best,
+        "mb_per_s": size_mb / best if best else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", help="take page texts from this PDF")
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--words-per-page", type=int, default=600)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    processor = PDFProcessor()
+    if args.pdf:
+        pages = processor.extract_text_from_pdf(args.pdf)
+    else:
+        pages = synthetic_pages(args.pages, args.words_per_page)
+
+    results = {
+        "pages": len(pages),
+        "text_mb": sum(len(page["text"].encode("utf-8")) for page in pages) / 1e6,
+        "max_tokens": Config.MAX_TOKENS,
+        "overlap_tokens": Config.CHUNK_OVERLAP_TOKENS,
+        "offset": measure(OffsetChunker().iter_chunks, pages, args.repeat),
+    }
+    try:
+        results["nltk"] = measure(processor.iter_nltk_chunks, pages, args.repeat)
+    except LookupError:
+        # See NLTK_DATA_DIR / NLTK_DOWNLOAD
+        results["nltk"] = {"error": "nltk punkt_tab tokenizer data not found"}
+    if results["nltk"].get("mb_per_s"):
+        results["speedup"] = results["offset"]["mb_per_s"] / results["nltk"]["mb_per_s"]
+
+    write_results("chunking", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
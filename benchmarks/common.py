@@ -0,0 +1,76 @@
+"""Helpers shared by the benchmark scripts."""
+
+import json
+import math
+import platform
+import statistics
+import subprocess
+import time
+
+
+def percentile(sorted_samples, pct):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_samples:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+def latency_stats(samples, elapsed=None):
+    """Summarize latencies in seconds as milliseconds, plus throughput."""
+    ordered = sorted(samples)
+    stats = {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000 if ordered else None,
+        "p50_ms": _ms(percentile(ordered, 50)),
+        "p95_ms": _ms(percentile(ordered, 95)),
+        "p99_ms": _ms(percentile(ordered, 99)),
+        "max_ms": _ms(ordered[-1] if ordered else None),
+    }
+    if elapsed:
+        stats["throughput_per_s"] = len(ordered) / elapsed
+    return stats
+
+
+def _ms(seconds):
+    return None if seconds is None else seconds * 1000
+
+
+def timed(fn, *args, repeat=1, **kwargs):
+    """Call ``fn`` ``repeat`` times; return the last result and the timings."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(name, results, output=None):
+    """Print results and optionally save them as JSON for later comparison."""
+    document = {
+        "benchmark": name,
+        "timestamp": time.time(),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    print(json.dumps(document, indent=2))
+    if output:
+        with open(output, "w") as f:
+            json.dump(document, f, indent=2)
+    return document
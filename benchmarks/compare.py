@@ -0,0 +1,67 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 10
+
+Every numeric field present in both files is listed with its relative
+change. Latency fields (*_ms, *_s, seconds) regress when they grow, rate
+fields (*_per_s, speedup) when they shrink. Exits with status 1 if any field
+regressed by more than --threshold percent.
+"""
+
+import argparse
+import json
+import sys
+
+HIGHER_IS_BETTER = ("_per_s", "speedup", "hit_rate", "recall")
+LOWER_IS_BETTER = ("_ms", "_s", "seconds", "_bytes", "_mb")
+IGNORED = ("timestamp", "count", "runs", "chunks", "pages", "summaries", "errors")
+
+
+def flatten(value, prefix=""):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten(item, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, float(value)
+
+
+def direction(path):
+    leaf = path.rsplit(".", 1)[-1]
+    if leaf in IGNORED or path.startswith("results.config"):
+        return 0
+    if any(marker in leaf for marker in HIGHER_IS_BETTER):
+        return 1
+    if leaf.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = dict(flatten(json.load(f)))
+    with open(args.candidate) as f:
+        candidate = dict(flatten(json.load(f)))
+
+    regressions = 0
+    for path in sorted(baseline.keys() & candidate.keys()):
+        better = direction(path)
+        if not better or not baseline[path]:
+            continue
+        change = (candidate[path] - baseline[path]) / abs(baseline[path]) * 100
+        regressed = -change * better > args.threshold
+        regressions += regressed
+        flag = "REGRESSION" if regressed else ""
+        print(f"{path:60} {baseline[path]:12.3f} {candidate[path]:12.3f} {change:+8.1f}% {flag}")
+
+    print(f"\n{regressions} regression(s) above {args.threshold}%")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
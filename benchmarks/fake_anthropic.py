@@ -0,0 +1,278 @@
+"""Local stand-in for the Anthropic Messages API with configurable latency.
+
+    python -m benchmarks.fake_anthropic --port 8765 --latency-ms 300 --jitter-ms 100
+
+Point the service at it with ANTHROPIC_BASE_URL=http://127.0.0.1:8765 (any
+ANTHROPIC_API_KEY value works). POST /v1/messages is answered after the
+configured delay, with a usage block estimated from the prompt size; requests
+with "stream": true get a server-sent event stream, and requests that force
+a tool call get a tool_use block filling every property of its schema.
+
+Rate limits can be simulated: --rpm accepts at most that many requests per
+minute (a token bucket, like the real API), and --fail-rate rejects that
+fraction of requests at random. Rejected requests get a 429
+rate_limit_error with a retry-after header, without the latency delay.
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHARS_PER_TOKEN = 4
+
+
+class FakeAnthropicServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Many clients connect at once under load; the default backlog is 5
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        address,
+        latency_ms=200.0,
+        jitter_ms=0.0,
+        stream_delta_ms=20.0,
+        answer="This is a synthetic answer from the fake Anthropic server.",
+        rpm=0,
+        fail_rate=0.0,
+        retry_after=1.0,
+    ):
+        super().__init__(address, FakeAnthropicHandler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.stream_delta_ms = stream_delta_ms
+        self.answer = answer
+        self.rpm = rpm
+        self.fail_rate = fail_rate
+        self.retry_after = retry_after
+        self.requests_served = 0
+        self.requests_rejected = 0
+        self._lock = threading.Lock()
+        self._allowance = float(rpm)
+        self._allowance_updated = time.monotonic()
+
+    def delay(self):
+        jitter = random.uniform(-self.jitter_ms, self.jitter_ms)
+        time.sleep(max(0.0, self.latency_ms + jitter) / 1000)
+
+    def count_request(self):
+        with self._lock:
+            self.requests_served += 1
+
+    def rejection(self):
+        """Seconds to put in retry-after if this request is rate limited."""
+        with self._lock:
+            if self.fail_rate and random.random() < self.fail_rate:
+                self.requests_rejected += 1
+                return self.retry_after
+            if not self.rpm:
+                return None
+            now = time.monotonic()
+            rate = self.rpm / 60
+            self._allowance = min(
+                float(self.rpm), self._allowance + (now - self._allowance_updated) * rate
+            )
+            self._allowance_updated = now
+            if self._allowance >= 1:
+                self._allowance -= 1
+                return None
+            self.requests_rejected += 1
+            return (1 - self._allowance) / rate
+
+
+def _input_tokens(body):
+    def text_of(content):
+        if isinstance(content, str):
+            return content
+        return " ".join(block.get("text", "") for block in content)
+
+    chars = sum(len(text_of(m["content"])) for m in body.get("messages", []))
+    system = body.get("system") or ""
+    chars += len(text_of(system)) if system else 0
+    return max(1, chars // CHARS_PER_TOKEN)
+
+
+def _forced_tool(body):
+    choice = body.get("tool_choice") or {}
+    if choice.get("type") != "tool":
+        return None
+    return next(
+        (tool for tool in body.get("tools", []) if tool.get("name") == choice.get("name")),
+        None,
+    )
+
+
+class FakeAnthropicHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("content-length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.rstrip("/") != "/v1/messages":
+            self._send_json(404, {"type": "error", "error": {"type": "not_found_error"}})
+            return
+
+        retry_after = self.server.rejection()
+        if retry_after is not None:
+            self._send_json(
+                429,
+                {
+                    "type": "error",
+                    "error": {"type": "rate_limit_error", "message": "Rate limited (fake)"},
+                },
+                headers={"retry-after": f"{math.ceil(retry_after)}"},
+            )
+            return
+        self.server.count_request()
+        self.server.delay()
+        text = self.server.answer
+        tool = _forced_tool(body)
+        if tool is not None:
+            # Fill every property of the forced tool's schema with the answer
+            properties = tool["input_schema"].get("properties", {})
+            content = [
+                {
+                    "type": "tool_use",
+                    "id": f"toolu_{uuid.uuid4().hex}",
+                    "name": tool["name"],
+                    "input": {key: text for key in properties},
+                }
+            ]
+            output_chars = len(text) * max(1, len(properties))
+            stop_reason = "tool_use"
+        else:
+            content = [{"type": "text", "text": text}]
+            output_chars = len(text)
+            stop_reason = "end_turn"
+        usage = {
+            "input_tokens": _input_tokens(body),
+            "output_tokens": max(1, output_chars // CHARS_PER_TOKEN),
+        }
+        if body.get("stream"):
+            self._stream(body, text, usage)
+        else:
+            self._send_json(
+                200,
+                {
+                    "id": f"msg_{uuid.uuid4().hex}",
+                    "type": "message",
+                    "role": "assistant",
+                    "model": body.get("model", "fake"),
+                    "content": content,
+                    "stop_reason": stop_reason,
+                    "stop_sequence": None,
+                    "usage": usage,
+                },
+            )
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, body, text, usage):
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("cache-control", "no-cache")
+        self.send_header("connection", "close")
+        self.end_headers()
+
+        def event(name, payload):
+            self.wfile.write(f"event: {name}\ndata: {json.dumps(payload)}\n\n".encode())
+            self.wfile.flush()
+
+        event(
+            "message_start",
+            {
+                "type": "message_start",
+                "message": {
+                    "id": f"msg_{uuid.uuid4().hex}",
+                    "type": "message",
+                    "role": "assistant",
+                    "model": body.get("model", "fake"),
+                    "content": [],
+                    "stop_reason": None,
+                    "stop_sequence": None,
+                    "usage": {"input_tokens": usage["input_tokens"], "output_tokens": 0},
+                },
+            },
+        )
+        event(
+            "content_block_start",
+            {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+        )
+        for word in text.split(" "):
+            time.sleep(self.server.stream_delta_ms / 1000)
+            event(
+                "content_block_delta",
+                {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": word + " "}},
+            )
+        event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        event(
+            "message_delta",
+            {
+                "type": "message_delta",
+                "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                "usage": {"output_tokens": usage["output_tokens"]},
+            },
+        )
+        event("message_stop", {"type": "message_stop"})
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_in_background(host="127.0.0.1", port=0, **options):
+    """Start a server on a daemon thread; returns it (see ``server_address``)."""
+    server = FakeAnthropicServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--stream-delta-ms", type=float, default=20.0)
+    parser.add_argument(
+        "--rpm", type=int, default=0, help="requests per minute before 429s (0 = no limit)"
+    )
+    parser.add_argument(
+        "--fail-rate", type=float, default=0.0, help="fraction of requests rejected with 429"
+    )
+    parser.add_argument(
+        "--retry-after", type=float, default=1.0, help="retry-after seconds for --fail-rate"
+    )
+    args = parser.parse_args()
+
+    server = FakeAnthropicServer(
+        (args.host, args.port),
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        stream_delta_ms=args.stream_delta_ms,
+        rpm=args.rpm,
+        fail_rate=args.fail_rate,
+        retry_after=args.retry_after,
+    )
+    print(f"Fake Anthropic API listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Compare the per_pdf and shared chunk layouts (VECTOR_LAYOUT) as PDFs grow.
+
+    python -m benchmarks.layout --pdfs 100 1000 5000 --chunks-per-pdf 30 \\
+        --output layout.json
+
+For each corpus size, both layouts are filled with the same random vectors,
+each in a temporary Chroma directory. A fresh process then opens the store
+and queries random PDFs, the way a restarted worker would. Reported: load
+time, disk size, time to open the client, the first query on each PDF (which
+has to load its index) and repeated queries, and the process RSS afterwards.
+Vectors are stored precomputed, so the embedding model is never loaded.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import latency_stats, write_results
+
+CHUNK_COLLECTION = "pdf_chunks"  # as in app.utils.resources
+
+
+def _vectors(rng, count, dim):
+    import numpy as np
+
+    vectors = rng.standard_normal((count, dim)).astype("float32")
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def populate(path, layout, num_pdfs, chunks_per_pdf, dim, seed):
+    import chromadb
+    import numpy as np
+
+    client = chromadb.PersistentClient(path=path)
+    rng = np.random.default_rng(seed)
+    shared = (
+        client.get_or_create_collection(CHUNK_COLLECTION, embedding_function=None)
+        if layout == "shared"
+        else None
+    )
+    start = time.perf_counter()
+    for i in range(num_pdfs):
+        pdf_id = f"pdf_{i}"
+        ids = [f"chunk_{n}" for n in range(chunks_per_pdf)]
+        metadatas = [{"chunk_id": chunk_id, "page_number": 1} for chunk_id in ids]
+        if layout == "shared":
+            collection = shared
+            ids = [f"{pdf_id}:{chunk_id}" for chunk_id in ids]
+            for metadata in metadatas:
+                metadata["pdf_id"] = pdf_id
+        else:
+            collection = client.get_or_create_collection(pdf_id, embedding_function=None)
+        collection.add(
+            ids=ids,
+            embeddings=_vectors(rng, chunks_per_pdf, dim),
+            documents=[f"{pdf_id} text {n}" for n in range(chunks_per_pdf)],
+            metadatas=metadatas,
+        )
+    return time.perf_counter() - start
+
+
+def _disk_bytes(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def _rss_bytes():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return None
+
+
+def probe(path, layout, num_pdfs, queries, distinct_pdfs, dim, n_results, seed):
+    """Runs in a fresh process: open the store and query it like a worker."""
+    import numpy as np
+
+    start = time.perf_counter()
+    import chromadb
+
+    client = chromadb.PersistentClient(path=path)
+    shared = (
+        client.get_collection(CHUNK_COLLECTION, embedding_function=None)
+        if layout == "shared"
+        else None
+    )
+    open_seconds = time.perf_counter() - start
+
+    rng = random.Random(seed)
+    pdf_ids = [f"pdf_{i}" for i in rng.sample(range(num_pdfs), min(distinct_pdfs, num_pdfs))]
+    vectors = _vectors(np.random.default_rng(seed), queries, dim)
+    collections = {}
+    first, repeat = [], []
+    for i in range(queries):
+        pdf_id = pdf_ids[i % len(pdf_ids)]
+        start = time.perf_counter()
+        if layout == "shared":
+            shared.query(
+                query_embeddings=vectors[i : i + 1],
+                n_results=n_results,
+                where={"pdf_id": pdf_id},
+            )
+        else:
+            if pdf_id not in collections:
+                collections[pdf_id] = client.get_collection(pdf_id, embedding_function=None)
+            collections[pdf_id].query(query_embeddings=vectors[i : i + 1], n_results=n_results)
+        elapsed = time.perf_counter() - start
+        (first if i < len(pdf_ids) else repeat).append(elapsed)
+    return {
+        "open_client_s": open_seconds,
+        "first_query_per_pdf": latency_stats(first),
+        "repeat_query": latency_stats(repeat),
+        "rss_bytes": _rss_bytes(),
+    }
+
+
+def run_probe(path, layout, args):
+    command = [
+        sys.executable,
+        "-m",
+        "benchmarks.layout",
+        "--probe",
+        path,
+        "--layout",
+        layout,
+        "--pdfs",
+        str(args.pdfs[0]),
+        "--queries",
+        str(args.queries),
+        "--distinct-pdfs",
+        str(args.distinct_pdfs),
+        "--dim",
+        str(args.dim),
+        "--n-results",
+        str(args.n_results),
+    ]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdfs", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--chunks-per-pdf", type=int, default=30)
+    parser.add_argument("--dim", type=int, default=384, help="embedding dimension")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument(
+        "--distinct-pdfs", type=int, default=50, help="PDFs the queries are spread over"
+    )
+    parser.add_argument("--n-results", type=int, default=3)
+    parser.add_argument("--layouts", nargs="+", default=["per_pdf", "shared"])
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--probe", help=argparse.SUPPRESS)
+    parser.add_argument("--layout", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        result = probe(
+            args.probe,
+            args.layout,
+            args.pdfs[0],
+            args.queries,
+            args.distinct_pdfs,
+            args.dim,
+            args.n_results,
+            seed=1,
+        )
+        print(json.dumps(result))
+        return
+
+    results = {}
+    for num_pdfs in args.pdfs:
+        for layout in args.layouts:
+            workdir = tempfile.mkdtemp(prefix="pdf_qa_layout_")
+            try:
+                load_seconds = populate(
+                    workdir, layout, num_pdfs, args.chunks_per_pdf, args.dim, seed=0
+                )
+                probe_args = argparse.Namespace(**{**vars(args), "pdfs": [num_pdfs]})
+                results[f"{layout}_{num_pdfs}"] = {
+                    "pdfs": num_pdfs,
+                    "chunks": num_pdfs * args.chunks_per_pdf,
+                    "load_seconds": load_seconds,
+                    "disk_bytes": _disk_bytes(workdir),
+                    **run_probe(workdir, layout, probe_args),
+                }
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+    write_results("layout", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
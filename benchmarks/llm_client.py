@@ -0,0 +1,200 @@
+"""Check LLMClient's retries, give-up and coalescing against the fake API.
+
+    python -m benchmarks.llm_client --output llm_client.json
+
+Each scenario starts its own fake Anthropic server (benchmarks.fake_anthropic)
+and a fresh ResourceRegistry pointed at it, sets the LLM_* settings it needs,
+and checks what the client and the server saw:
+
+- retry_after: with a share of requests rejected with 429 and a retry-after,
+  concurrent calls (plain and streamed) all succeed, after waiting at least
+  the retry-after.
+- unavailable: when every request is rejected, the call raises
+  LLMUnavailableError carrying the retry-after, after LLM_MAX_RETRIES
+  retries.
+- coalescing: identical concurrent calls, sync and async, reach the server
+  once; with LLM_COALESCE off, once each.
+
+Results are printed as JSON like the other benchmarks. The exit status is 1
+if any check failed, so the script can run in CI.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from benchmarks.common import write_results
+from benchmarks.fake_anthropic import start_in_background
+
+MODEL = "claude-fake"
+
+
+@asynccontextmanager
+async def _fake_api(settings, **server_options):
+    """A fake server and a registry using it, with Config ``settings`` applied."""
+    from app.utils.config import Config
+    from app.utils.resources import ResourceRegistry
+
+    server = start_in_background(**server_options)
+    previous_url = os.environ.get("ANTHROPIC_BASE_URL")
+    os.environ["ANTHROPIC_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    settings = {"ANTHROPIC_API_KEY": "fake", **settings}
+    saved = {name: getattr(Config, name) for name in settings}
+    for name, value in settings.items():
+        setattr(Config, name, value)
+    registry = ResourceRegistry()
+    try:
+        yield server, registry
+    finally:
+        await registry.aclose()
+        for name, value in saved.items():
+            setattr(Config, name, value)
+        if previous_url is None:
+            os.environ.pop("ANTHROPIC_BASE_URL", None)
+        else:
+            os.environ["ANTHROPIC_BASE_URL"] = previous_url
+        server.shutdown()
+        server.server_close()
+
+
+def _request(prompt):
+    return {
+        "model": MODEL,
+        "max_tokens": 64,
+        "messages": [{"role": "user", "content": prompt}],
+    }
+
+
+async def check_retry_after(calls, fail_rate, retry_after):
+    settings = {
+        "LLM_MAX_RETRIES": 8,
+        "LLM_BACKOFF_BASE_SECONDS": 0.05,
+        "LLM_REQUESTS_PER_MINUTE": 0,
+        "LLM_TOKENS_PER_MINUTE": 0,
+    }
+    async with _fake_api(
+        settings, latency_ms=20, stream_delta_ms=1, fail_rate=fail_rate, retry_after=retry_after
+    ) as (server, registry):
+        llm = registry.llm
+
+        async def call(index):
+            # Every other call streams; distinct prompts so none are coalesced
+            request = _request(f"question {index}")
+            if index % 2:
+                response = await llm.astream("answer", lambda text: None, **request)
+            else:
+                response = await llm.acreate("answer", **request)
+            return response.content[0].text
+
+        start = time.perf_counter()
+        answers = await asyncio.gather(
+            *(call(index) for index in range(calls)), return_exceptions=True
+        )
+        elapsed = time.perf_counter() - start
+    failures = [repr(answer) for answer in answers if isinstance(answer, BaseException)]
+    rejected = server.requests_rejected
+    return {
+        "passed": not failures and rejected > 0 and elapsed >= retry_after,
+        "calls": calls,
+        "requests_served": server.requests_served,
+        "requests_rejected": rejected,
+        "elapsed_s": elapsed,
+        "failures": failures,
+    }
+
+
+async def check_unavailable(max_retries, retry_after):
+    from app.models.llm_client import LLMUnavailableError
+
+    settings = {
+        "LLM_MAX_RETRIES": max_retries,
+        "LLM_BACKOFF_BASE_SECONDS": 0.05,
+        "LLM_REQUESTS_PER_MINUTE": 0,
+        "LLM_TOKENS_PER_MINUTE": 0,
+    }
+    async with _fake_api(settings, latency_ms=0, fail_rate=1.0, retry_after=retry_after) as (
+        server,
+        registry,
+    ):
+        error = None
+        start = time.perf_counter()
+        try:
+            await registry.llm.acreate("answer", **_request("always rejected"))
+        except LLMUnavailableError as e:
+            error = e
+        elapsed = time.perf_counter() - start
+    return {
+        "passed": (
+            error is not None
+            and error.rate_limited
+            and error.retry_after == retry_after
+            and server.requests_rejected == max_retries + 1
+            and elapsed >= max_retries * retry_after
+        ),
+        "raised": error is not None,
+        "rate_limited": getattr(error, "rate_limited", None),
+        "retry_after": getattr(error, "retry_after", None),
+        "requests_rejected": server.requests_rejected,
+        "elapsed_s": elapsed,
+    }
+
+
+async def check_coalescing(callers, coalesce):
+    settings = {"LLM_COALESCE": coalesce, "LLM_MAX_RETRIES": 0}
+    async with _fake_api(settings, latency_ms=300) as (server, registry):
+        llm = registry.llm
+        request = _request("the same question")
+        await asyncio.gather(*(llm.acreate("answer", **request) for _ in range(callers)))
+        served_async = server.requests_served
+
+        def call_from_threads():
+            with ThreadPoolExecutor(max_workers=callers) as pool:
+                list(pool.map(lambda _: llm.create("answer", **request), range(callers)))
+
+        await asyncio.to_thread(call_from_threads)
+        served_sync = server.requests_served - served_async
+    expected = 1 if coalesce else callers
+    return {
+        "passed": served_async == expected and served_sync == expected,
+        "callers": callers,
+        "requests_served_async": served_async,
+        "requests_served_sync": served_sync,
+    }
+
+
+async def run(args):
+    return {
+        "retry_after": await check_retry_after(args.calls, args.fail_rate, args.retry_after),
+        "unavailable": await check_unavailable(args.max_retries, args.retry_after),
+        "coalescing": await check_coalescing(args.callers, coalesce=True),
+        "no_coalescing": await check_coalescing(args.callers, coalesce=False),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20, help="calls in the retry scenario")
+    parser.add_argument("--fail-rate", type=float, default=0.3)
+    parser.add_argument("--retry-after", type=float, default=1.0, help="whole seconds")
+    parser.add_argument("--max-retries", type=int, default=2, help="for the give-up scenario")
+    parser.add_argument("--callers", type=int, default=10, help="for the coalescing scenario")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    results = asyncio.run(run(args))
+    write_results("llm_client", results, args.output)
+    failed = [name for name, result in results.items() if not result["passed"]]
+    if failed:
+        print(f"Failed: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""HTTP load driver for a running instance of the service.
+
+Start the service (optionally against benchmarks.fake_anthropic), then:
+
+    python -m benchmarks.load --base-url http://127.0.0.1:8000 \\
+        --scenarios upload ask existing_pdfs purge \\
+        --requests 50 --concurrency 8 --output load.json
+
+Scenarios run in the order given. "upload" posts freshly generated PDFs
+(never duplicates) and also reports end-to-end ingestion time by polling
+/jobs/{id}; "ask", "ask_stream" and "purge" use the PDFs uploaded earlier in
+the run, or --pdf-id for the ask scenarios. Each scenario reports throughput
+and p50/p95/p99; "ask_stream" also reports the time to the first token.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+from benchmarks.common import latency_stats, write_results
+from benchmarks.synthetic_pdf import VOCABULARY, synthetic_pdf_bytes
+
+QUESTION_TEMPLATES = [
+    "What does the document say about {}?",
+    "Summarize the {} section.",
+    "Is there any {} mentioned?",
+    "Who is responsible for the {}?",
+]
+
+
+class LoadDriver:
+    def __init__(self, client, concurrency):
+        self.client = client
+        self.concurrency = concurrency
+        self.pdf_ids = []
+
+    async def run(self, num_requests, make_request):
+        """Issue ``num_requests`` calls of ``make_request(i)`` with bounded concurrency."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        latencies = []
+        errors = 0
+
+        async def one(i):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await make_request(i)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(num_requests)))
+        stats = latency_stats(latencies, elapsed=time.perf_counter() - start)
+        stats["errors"] = errors
+        return stats
+
+    async def upload(self, num_requests, pages, words_per_page, wait, seed):
+        jobs = []
+
+        async def make_request(i):
+            pdf = synthetic_pdf_bytes(pages, words_per_page, seed=f"{seed}-{i}")
+            start = time.perf_counter()
+            response = await self.client.post(
+                "/upload_pdf/",
+                files={"file": (f"bench_{i}.pdf", pdf, "application/pdf")},
+            )
+            if response.status_code < 400:
+                job = response.json()
+                self.pdf_ids.append(job["pdf_id"])
+                jobs.append((job["job_id"], start))
+            return response
+
+        stats = {"accept": await self.run(num_requests, make_request)}
+        if wait:
+            finished = await asyncio.gather(
+                *(self._wait_for_job(job_id) for job_id, _ in jobs)
+            )
+            ingest_times = [
+                end - start for (_, start), end in zip(jobs, finished) if end is not None
+            ]
+            stats["ingest_end_to_end"] = latency_stats(ingest_times)
+            stats["ingest_end_to_end"]["errors"] = finished.count(None)
+        return stats
+
+    async def _wait_for_job(self, job_id, poll_interval=0.1, timeout=600):
+        # Returns the time the job was seen completed, or None if it failed
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            response = await self.client.get(f"/jobs/{job_id}")
+            status = response.json().get("status")
+            if status == "completed":
+                return time.perf_counter()
+            if status == "failed":
+                return None
+            await asyncio.sleep(poll_interval)
+        return None
+
+    def _ask_payloads(self, questions_per_request, pdf_id, route, batch_questions, seed):
+        rng = random.Random(seed)
+        pdf_ids = [pdf_id] if pdf_id else self.pdf_ids
+        if not pdf_ids and not route:
+            raise SystemExit("ask needs --pdf-id, --route or a preceding upload")
+
+        def payload(i):
+            questions = [
+                rng.choice(QUESTION_TEMPLATES).format(rng.choice(VOCABULARY))
+                for _ in range(questions_per_request)
+            ]
+            payload = {"questions": questions, "batch_questions": batch_questions}
+            if not route:
+                payload["pdf_id"] = pdf_ids[i % len(pdf_ids)]
+            return payload
+
+        return payload
+
+    async def ask(
+        self, num_requests, questions_per_request, pdf_id, route, batch_questions, seed
+    ):
+        payload = self._ask_payloads(
+            questions_per_request, pdf_id, route, batch_questions, seed
+        )
+        return await self.run(
+            num_requests,
+            lambda i: self.client.post("/ask_questions/", json=payload(i)),
+        )
+
+    async def ask_stream(self, num_requests, questions_per_request, pdf_id, route, seed):
+        payload = self._ask_payloads(questions_per_request, pdf_id, route, False, seed)
+        first_delta = []
+
+        async def make_request(i):
+            start = time.perf_counter()
+            async with self.client.stream(
+                "POST",
+                "/ask_questions/stream",
+                json=payload(i),
+                headers={"accept": "application/x-ndjson"},
+            ) as response:
+                seen_delta = False
+                async for line in response.aiter_lines():
+                    if not seen_delta and line.startswith('{"event": "delta"'):
+                        first_delta.append(time.perf_counter() - start)
+                        seen_delta = True
+            return response
+
+        # Latency is to the end of the stream; first_delta is time to first token
+        stats = await self.run(num_requests, make_request)
+        stats["first_delta"] = latency_stats(first_delta)
+        return stats
+
+    async def existing_pdfs(self, num_requests):
+        return await self.run(num_requests, lambda i: self.client.get("/existing_pdfs"))
+
+    async def purge(self):
+        pdf_ids = list(self.pdf_ids)
+        self.pdf_ids = []
+        return await self.run(
+            len(pdf_ids),
+            lambda i: self.client.post("/purge", params={"pdf_id": pdf_ids[i]}),
+        )
+
+
+async def run_load(args):
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    results = {
+        "config": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output",)
+        }
+    }
+    async with httpx.AsyncClient(
+        base_url=args.base_url, timeout=timeout, limits=limits
+    ) as client:
+        driver = LoadDriver(client, args.concurrency)
+        for scenario in args.scenarios:
+            if scenario == "upload":
+                results[scenario] = await driver.upload(
+                    args.requests, args.pages, args.words_per_page, args.wait_ingest, args.seed
+                )
+            elif scenario == "ask":
+                results[scenario] = await driver.ask(
+                    args.requests,
+                    args.questions,
+                    args.pdf_id,
+                    args.route,
+                    args.batch_questions,
+                    args.seed,
+                )
+            elif scenario == "ask_stream":
+                results[scenario] = await driver.ask_stream(
+                    args.requests, args.questions, args.pdf_id, args.route, args.seed
+                )
+            elif scenario == "existing_pdfs":
+                results[scenario] = await driver.existing_pdfs(args.requests)
+            elif scenario == "purge":
+                results[scenario] = await driver.purge()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        default=["upload", "ask", "existing_pdfs", "purge"],
+        choices=["upload", "ask", "ask_stream", "existing_pdfs", "purge"],
+    )
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=20, help="pages per uploaded PDF")
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument(
+        "--no-wait-ingest",
+        dest="wait_ingest",
+        action="store_false",
+        help="don't poll upload jobs to completion",
+    )
+    parser.add_argument("--questions", type=int, default=5, help="questions per ask")
+    parser.add_argument("--pdf-id", help="ask against this existing pdf_id")
+    parser.add_argument(
+        "--route", action="store_true", help="omit pdf_id so questions are routed"
+    )
+    parser.add_argument(
+        "--batch-questions",
+        action="store_true",
+        help="ask in batch_questions mode (one LLM call per group of questions)",
+    )
+    parser.add_argument("--seed", default=str(int(time.time())))
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    write_results("load", asyncio.run(run_load(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Per-stage microbenchmarks for PDFProcessor, EmbeddingsManager and routing.
+
+    python -m benchmarks.stages --pages 200 --summaries 1000 --output stages.json
+
+Runs against a throwaway Chroma directory (--persist-dir, a temporary
+directory by default) with the real embedding model; no Anthropic calls are
+made. Stages: extract (sequential and parallel), chunk, embed, retrieve
+(one batched query vs. one query per question) and route (a Chroma
+query_pdf_summaries vs. the in-memory summary matrix for a batch of
+--questions, over --summaries synthetic summaries).
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.common import latency_stats, timed, write_results
+from benchmarks.synthetic_pdf import VOCABULARY, write_synthetic_pdf
+
+
+def bench_extract(pdf_path, repeat):
+    from app.models.pdf_processor import PDFProcessor
+
+    results = {}
+    for mode, parallel in (("sequential", False), ("parallel", True)):
+        pages, timings = timed(
+            PDFProcessor().extract_text_from_pdf, pdf_path, parallel=parallel, repeat=repeat
+        )
+        best = min(timings)
+        results[mode] = {"best_s": best, "pages_per_s": len(pages) / best}
+    return pages, results
+
+
+def bench_chunk(pages, repeat):
+    from app.models.pdf_processor import PDFProcessor
+
+    chunks, timings = timed(PDFProcessor().tokenize_text, pages, repeat=repeat)
+    best = min(timings)
+    size_mb = sum(len(page["text"].encode("utf-8")) for page in pages) / 1e6
+    return chunks, {
+        "chunks": len(chunks),
+        "best_s": best,
+        "chunks_per_s": len(chunks) / best,
+        "mb_per_s": size_mb / best,
+    }
+
+
+def bench_embed(chunks):
+    from app.models.embeddings_manager import EmbeddingsManager
+
+    manager = EmbeddingsManager("bench_stage_embed")
+    start = time.perf_counter()
+    manager.update_embeddings(chunks)
+    elapsed = time.perf_counter() - start
+    return manager, {"chunks": len(chunks), "seconds": elapsed, "chunks_per_s": len(chunks) / elapsed}
+
+
+def _questions(rng, count):
+    return [f"What does the document say about {rng.choice(VOCABULARY)}?" for _ in range(count)]
+
+
+def bench_retrieve(manager, num_questions, repeat, rng):
+    batched, per_question = [], []
+    for _ in range(repeat):
+        questions = _questions(rng, num_questions)
+        _, timings = timed(manager.query_embeddings_batch, questions)
+        batched.extend(timings)
+        start = time.perf_counter()
+        for question in questions:
+            manager.query_embeddings(question)
+        per_question.append(time.perf_counter() - start)
+    return {
+        "questions_per_request": num_questions,
+        "batched": latency_stats(batched),
+        "one_query_per_question": latency_stats(per_question),
+    }
+
+
+def bench_route(num_summaries, num_questions, repeat, rng):
+    from app.models.embeddings_manager import add_pdf_summary, query_pdf_summaries
+    from app.models.summary_router import summary_router
+    from app.utils.resources import resources
+
+    start = time.perf_counter()
+    for i in range(num_summaries):
+        summary = " ".join(rng.choice(VOCABULARY) for _ in range(60))
+        add_pdf_summary(pdf_id=f"bench_summary_{i}", summary=summary)
+    load_seconds = time.perf_counter() - start
+
+    latencies = []
+    for question in _questions(rng, repeat):
+        _, timings = timed(query_pdf_summaries, question, top_k=1)
+        latencies.extend(timings)
+
+    # The in-memory matrix, for a batch of already embedded questions (the
+    # embeddings are reused by retrieval, so they are not part of routing)
+    summary_router.route(resources.embedding_function(["warm up"]))
+    matrix = []
+    for _ in range(repeat):
+        embeddings = resources.embedding_function(_questions(rng, num_questions))
+        _, timings = timed(summary_router.route, embeddings, top_k=1)
+        matrix.extend(timings)
+    return {
+        "summaries": num_summaries,
+        "load_seconds": load_seconds,
+        "query": latency_stats(latencies),
+        "matrix_batch": {"questions": num_questions, **latency_stats(matrix)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", help="benchmark this PDF instead of a synthetic one")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--summaries", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--persist-dir", help="Chroma directory (default: temporary)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="pdf_qa_bench_")
+    # Must be set before app.utils.config is imported
+    os.environ["CHROMADB_PERSIST_DIR"] = args.persist_dir or os.path.join(workdir, "chroma")
+
+    pdf_path = args.pdf or write_synthetic_pdf(
+        os.path.join(workdir, "bench.pdf"), args.pages, args.words_per_page
+    )
+    rng = random.Random(0)
+
+    results = {"pdf": pdf_path}
+    pages, results["extract"] = bench_extract(pdf_path, args.repeat)
+    chunks, results["chunk"] = bench_chunk(pages, args.repeat)
+    manager, results["embed"] = bench_embed(chunks)
+    results["retrieve"] = bench_retrieve(manager, args.questions, args.repeat, rng)
+    results["route"] = bench_route(args.summaries, args.questions, args.repeat * 10, rng)
+    write_results("stages", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Startup benchmark: import time of app.main and time to the first /health.
+
+Run from the repository root:
+
+    python -m benchmarks.startup --runs 5 --output startup.json
+
+Each run uses a fresh interpreter, so nothing is shared between runs.
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from benchmarks.common import write_results
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def measure_import():
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_health(timeout=120.0):
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/health"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with code {server.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError(f"/health did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def summarize(samples):
+    return {
+        "runs": len(samples),
+        "min_s": min(samples),
+        "median_s": statistics.median(samples),
+        "max_s": max(samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    health = [measure_first_health() for _ in range(args.runs)]
+    results = {
+        "import_app_main": summarize(imports),
+        "first_health": summarize(health),
+        "env": {
+            "WARM_UP_ON_STARTUP": os.getenv("WARM_UP_ON_STARTUP", "true"),
+        },
+    }
+    write_results("startup", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Synthetic PDF generator for benchmarks.
+
+Writes text-only PDFs with a chosen page count and text density without any
+third-party PDF library:
+
+    python -m benchmarks.synthetic_pdf --out-dir bench_pdfs --pages 10 100 500 \\
+        --words-per-page 150 600
+
+Every (pages, words-per-page, seed) combination produces different text, so
+generated files are never deduplicated against each other on upload.
+"""
+
+import argparse
+import os
+import random
+
+VOCABULARY = (
+    "agreement party term notice termination clause payment invoice revenue "
+    "quarter fiscal growth margin customer supplier liability warranty "
+    "section schedule exhibit obligation confidential information period "
+    "renewal fee interest report board director officer shares dividend "
+    "policy employee benefit leave holiday compliance audit risk control"
+).split()
+
+WORDS_PER_LINE = 12
+LINE_HEIGHT = 14
+TOP_MARGIN = 780
+
+
+def page_lines(rng, words_per_page, page_number):
+    words = [rng.choice(VOCABULARY) for _ in range(words_per_page)]
+    lines = [f"Page {page_number}."]
+    for i in range(0, len(words), WORDS_PER_LINE):
+        lines.append(" ".join(words[i : i + WORDS_PER_LINE]) + ".")
+    return lines
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def build_pdf(pages):
+    """Return the bytes of a PDF whose pages show the given lists of lines."""
+    # Object numbers: 1 catalog, 2 page tree, 3 font, then page/content pairs
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    kids = []
+    for index, lines in enumerate(pages):
+        page_obj = 4 + 2 * index
+        content_obj = page_obj + 1
+        kids.append(f"{page_obj} 0 R")
+        # Shrink the font when a dense page would run off the bottom
+        font_size = min(10, max(2, TOP_MARGIN * 10 // (len(lines) * LINE_HEIGHT)))
+        leading = font_size * LINE_HEIGHT // 10
+        body = [f"BT /F1 {font_size} Tf {leading} TL 40 {TOP_MARGIN} Td"]
+        body += [f"({_escape(line)}) Tj T*" for line in lines]
+        body.append("ET")
+        stream = "\n".join(body).encode("latin-1")
+        objects[content_obj] = (
+            b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        )
+        objects[page_obj] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_obj} 0 R >>"
+        ).encode("latin-1")
+    objects[2] = (
+        f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>"
+    ).encode("latin-1")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += b"%d 0 obj\n" % number + objects[number] + b"\nendobj\n"
+    xref_offset = len(out)
+    size = max(objects) + 1
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % size
+    for number in range(1, size):
+        out += b"%010d 00000 n \n" % offsets[number]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        size,
+        xref_offset,
+    )
+    return bytes(out)
+
+
+def synthetic_pdf_bytes(num_pages, words_per_page=400, seed=0):
+    rng = random.Random(f"{num_pages}-{words_per_page}-{seed}")
+    return build_pdf(
+        [page_lines(rng, words_per_page, n) for n in range(1, num_pages + 1)]
+    )
+
+
+def write_synthetic_pdf(path, num_pages, words_per_page=400, seed=0):
+    with open(path, "wb") as f:
+        f.write(synthetic_pdf_bytes(num_pages, words_per_page, seed))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out-dir", default="bench_pdfs")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--words-per-page", type=int, nargs="+", default=[400])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    for num_pages in args.pages:
+        for words in args.words_per_page:
+            path = os.path.join(args.out_dir, f"synthetic_{num_pages}p_{words}w.pdf")
+            write_synthetic_pdf(path, num_pages, words, args.seed)
+            print(path)
+
+
+if __name__ == "__main__":
+    main()
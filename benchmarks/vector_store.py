@@ -0,0 +1,206 @@
+"""Compare the vector store backends (VECTOR_STORE): Chroma and memmap.
+
+    python -m benchmarks.vector_store --chunks 50000 --pdfs 500 --k 3 10 \\
+        --output vector_store.json
+
+Every backend is filled with the same clustered random vectors (a centre
+per PDF plus noise, roughly how chunk embeddings of one document sit
+together), in one collection with a ``pdf_id`` field like the shared chunk
+layout. A fresh process then opens the store, like a restarted worker, and
+runs the same queries twice: over the whole collection and filtered to one
+PDF. Reported per backend: load time, disk size, open time, query latency,
+recall@k against exact float32 search, and the process RSS afterwards, split
+into anonymous memory and mapped file pages (which worker processes share).
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import latency_stats, write_results
+
+COLLECTION = "pdf_chunks"  # as in app.utils.resources
+BACKENDS = ("chroma", "memmap-int8", "memmap-float16")
+LOAD_BATCH_SIZE = 1000
+
+
+def _dataset(num_chunks, num_pdfs, dim, num_queries, seed):
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((num_pdfs, dim)).astype("float32")
+    owners = rng.integers(0, num_pdfs, num_chunks)
+    vectors = centres[owners] + 0.6 * rng.standard_normal((num_chunks, dim)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    # Questions land near some chunk of their PDF
+    picks = rng.integers(0, num_chunks, num_queries)
+    queries = vectors[picks] + 0.05 * rng.standard_normal((num_queries, dim)).astype("float32")
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return vectors, owners, queries, owners[picks]
+
+
+def _ground_truth(vectors, owners, queries, query_owners, k):
+    # Exact float32 top-k, unfiltered and within the query's PDF
+    import numpy as np
+
+    scores = queries @ vectors.T
+    unfiltered = np.argsort(-scores, axis=1)[:, :k]
+    scores[owners[np.newaxis, :] != query_owners[:, np.newaxis]] = -np.inf
+    filtered = np.argsort(-scores, axis=1)[:, :k]
+    return unfiltered, filtered
+
+
+def _open_store(path, backend):
+    if backend == "chroma":
+        import chromadb
+        from app.models.vector_store import ChromaVectorStore
+
+        return ChromaVectorStore(chromadb.PersistentClient(path=path), embedding_function=None)
+    from app.models.vector_store import MemmapVectorStore
+
+    return MemmapVectorStore(path, dtype=backend.split("-")[1])
+
+
+def populate(path, backend, vectors, owners):
+    collection = _open_store(path, backend).get_collection(COLLECTION)
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), LOAD_BATCH_SIZE):
+        end = offset + LOAD_BATCH_SIZE
+        collection.add(
+            ids=[str(i) for i in range(offset, min(end, len(vectors)))],
+            embeddings=vectors[offset:end],
+            documents=[f"chunk {i}" for i in range(offset, min(end, len(vectors)))],
+            metadatas=[{"pdf_id": f"pdf_{owner}"} for owner in owners[offset:end]],
+        )
+    return time.perf_counter() - start
+
+
+def _disk_bytes(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def _memory():
+    fields = {"VmRSS:": "rss_bytes", "RssAnon:": "rss_anon_bytes", "RssFile:": "rss_file_bytes"}
+    memory = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key = line.split()[0] if line.strip() else None
+            if key in fields:
+                memory[fields[key]] = int(line.split()[1]) * 1024
+    return memory
+
+
+def _recall(found_ids, truth):
+    hits = sum(
+        len({int(chunk_id) for chunk_id in ids} & set(expected.tolist()))
+        for ids, expected in zip(found_ids, truth)
+    )
+    return hits / truth.size
+
+
+def probe(path, backend, data_path, ks):
+    """Runs in a fresh process: open the store and query it like a worker."""
+    import numpy as np
+
+    data = np.load(data_path)
+    queries, query_owners = data["queries"], data["query_owners"]
+    start = time.perf_counter()
+    collection = _open_store(path, backend).get_collection(COLLECTION)
+    collection.count()
+    result = {"open_s": time.perf_counter() - start}
+    for k in ks:
+        for mode in ("unfiltered", "filtered"):
+            found, timings = [], []
+            for query, owner in zip(queries, query_owners):
+                where = {"pdf_id": f"pdf_{owner}"} if mode == "filtered" else None
+                start = time.perf_counter()
+                hits = collection.query(
+                    query_embeddings=query[np.newaxis, :], n_results=k, where=where
+                )
+                timings.append(time.perf_counter() - start)
+                found.append(hits["ids"][0])
+            result[f"{mode}_k{k}"] = {
+                f"recall_at_{k}": _recall(found, data[f"{mode}_k{k}"]),
+                "latency": latency_stats(timings),
+            }
+    result.update(_memory())
+    return result
+
+
+def run_probe(path, backend, data_path, ks):
+    command = [
+        sys.executable,
+        "-m",
+        "benchmarks.vector_store",
+        "--probe",
+        path,
+        "--backend",
+        backend,
+        "--data",
+        data_path,
+        "--k",
+        *map(str, ks),
+    ]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--pdfs", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=384, help="embedding dimension")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 10])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--probe", help=argparse.SUPPRESS)
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    parser.add_argument("--data", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        print(json.dumps(probe(args.probe, args.backend, args.data, args.k)))
+        return
+
+    import numpy as np
+
+    vectors, owners, queries, query_owners = _dataset(
+        args.chunks, args.pdfs, args.dim, args.queries, seed=0
+    )
+    workdir = tempfile.mkdtemp(prefix="pdf_qa_vector_store_")
+    try:
+        truth = {}
+        for k in args.k:
+            truth[f"unfiltered_k{k}"], truth[f"filtered_k{k}"] = _ground_truth(
+                vectors, owners, queries, query_owners, k
+            )
+        data_path = os.path.join(workdir, "queries.npz")
+        np.savez(data_path, queries=queries, query_owners=query_owners, **truth)
+        results = {}
+        for backend in args.backends:
+            path = os.path.join(workdir, backend)
+            load_seconds = populate(path, backend, vectors, owners)
+            results[backend] = {
+                "chunks": args.chunks,
+                "load_seconds": load_seconds,
+                "disk_bytes": _disk_bytes(path),
+                **run_probe(path, backend, data_path, args.k),
+            }
+            shutil.rmtree(path, ignore_errors=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    write_results("vector_store", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import hashlib
+import os
+import tempfile
+
+import pytest
+
+from benchmarks.fake_anthropic import start_in_background
+
+# Config is read at import, so the app is pointed at throwaway storage and
+# the fake Anthropic API before any test imports it
+_workdir = tempfile.mkdtemp(prefix="pdf_qa_tests_")
+_fake_api = start_in_background(latency_ms=0, stream_delta_ms=0)
+os.environ.update(
+    CHROMADB_PERSIST_DIR=os.path.join(_workdir, "store"),
+    TEMP_PDF_DIR=os.path.join(_workdir, "pdfs"),
+    VECTOR_STORE="memmap",
+    ANTHROPIC_BASE_URL=f"http://127.0.0.1:{_fake_api.server_address[1]}",
+    ANTHROPIC_API_KEY="fake",
+    EMBED_WORKERS="1",
+    EXTRACT_WORKERS="1",
+    WARM_UP_ON_STARTUP="false",
+)
+
+
+def _embed(texts):
+    # Deterministic stand-in for the ONNX model, which needs a download
+    import numpy as np
+
+    return [
+        np.frombuffer(hashlib.sha512(text.encode("utf-8")).digest() * 6, dtype=np.uint8)[:384]
+        .astype(np.float32)
+        - 127.5
+        for text in texts
+    ]
+
+
+@pytest.fixture(autouse=True)
+def stand_in_embeddings(monkeypatch):
+    from app.utils.resources import resources
+
+    monkeypatch.setattr(resources, "_embedding_function", _embed)
+
+
+@pytest.fixture
+def workdir():
+    return _workdir
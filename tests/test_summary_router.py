@@ -0,0 +1,51 @@
+import os
+import uuid
+
+import pytest
+
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+
+def _ingest(workdir, seed):
+    from app.models.ingestion import ingest_pdf
+
+    pdf_id = str(uuid.uuid4())
+    pdf_path = os.path.join(workdir, f"{pdf_id}.pdf")
+    write_synthetic_pdf(pdf_path, 3, words_per_page=100, seed=seed)
+    return pdf_id, pdf_path, ingest_pdf
+
+
+def test_ingest_after_routing_on_an_empty_corpus(workdir):
+    from app.models.catalog import catalog
+    from app.models.summary_router import summary_router
+    from app.utils.resources import resources
+
+    # A question before the first upload loads an empty matrix
+    assert summary_router.route(resources.embedding_function(["a question"])) == [[]]
+
+    pdf_id, pdf_path, ingest_pdf = _ingest(workdir, seed=1)
+    result = ingest_pdf(pdf_id, pdf_path, content_hash=pdf_id)
+
+    assert catalog.get(pdf_id) is not None
+    summary_embedding = resources.embedding_function([result["summary"]])
+    assert summary_router.route(summary_embedding) == [[pdf_id]]
+
+
+def test_failed_ingest_leaves_no_summary_behind(workdir, monkeypatch):
+    from app.models.catalog import catalog
+    from app.models.embeddings_manager import get_summary_collection
+    from app.models.summary_router import summary_router
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("catalog unavailable")
+
+    # Fails after the summary has been stored and added to the router
+    monkeypatch.setattr(catalog, "add", fail)
+    pdf_id, pdf_path, ingest_pdf = _ingest(workdir, seed=2)
+    with pytest.raises(RuntimeError):
+        ingest_pdf(pdf_id, pdf_path, content_hash=pdf_id)
+
+    assert get_summary_collection().get(ids=[pdf_id])["ids"] == []
+    summary_router.route([[1.0] * 384])  # reloads if another process changed it
+    assert pdf_id not in summary_router._positions
+    assert catalog.get(pdf_id) is None